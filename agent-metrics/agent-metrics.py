@@ -1,20 +1,203 @@
+import json
 import os
+import socket
+import threading
 import time
+from collections import defaultdict
 
 from prometheus_client import CollectorRegistry, multiprocess, start_http_server
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
 
-# Set the same multiprocess directory used by all agent workers
-os.environ["prometheus_multiproc_dir"] = "/tmp/prometheus_multiproc"
+# "multiprocess" aggregates the prometheus_client files written by the workers,
+# "push" aggregates the batches workers send over the Unix socket
+TRANSPORT = os.environ.get("METRICS_TRANSPORT", "multiprocess")
+PUSH_SOCKET = os.environ.get("METRICS_PUSH_SOCKET", "/tmp/agent-metrics/metrics.sock")
+# A pushing process that has been silent this long is treated as dead
+STALE_AFTER = float(os.environ.get("METRICS_STALE_AFTER", "15"))
 
-# Create the registry and collect from all processes
-registry = CollectorRegistry()
-multiprocess.MultiProcessCollector(registry)
 
-# Start the HTTP server (this exposes /metrics)
-start_http_server(9100, addr="0.0.0.0", registry=registry)
+class PushAggregator:
+    """Authoritative in-memory aggregates of the metrics pushed by agent workers.
 
-print("Agent metrics aggregator running on port 9100")
+    Mirrors the prometheus_client multiprocess semantics: counters are summed over
+    every process that ever reported, and gauges are combined according to their
+    multiprocess mode, where the ``live*`` modes only include processes that have
+    neither sent an exit message nor gone silent for ``stale_after`` seconds.
 
-# Keep the process alive
-while True:
-    time.sleep(10)
+    With one process per job, dead processes are folded into a single set of
+    retired values per series, so memory and scrape cost follow the number of
+    series rather than the number of calls served. A silent process is kept
+    apart for another ``stale_after`` in case it resumes. Per-process ("all"
+    mode) gauges of dead processes are dropped.
+    """
+
+    def __init__(self, stale_after: float = STALE_AFTER):
+        self._stale_after = stale_after
+        self._lock = threading.Lock()
+        self._meta: dict[str, tuple[str, str, str]] = {}
+        # proc -> (metric, labels) -> (value, updated_at)
+        self._live: dict[str, dict[tuple, tuple[float, float]]] = {}
+        # silent procs -> (retired at, values), until they are folded
+        self._dead: dict[str, tuple[float, dict[tuple, tuple[float, float]]]] = {}
+        # (metric, labels) -> (value, updated_at) of every folded process
+        self._retired: dict[tuple, tuple[float, float]] = {}
+        self._last_seen: dict[str, float] = {}
+
+    def ingest(self, message: dict) -> None:
+        proc = message["proc"]
+        now = time.time()
+        with self._lock:
+            for name, meta in message.get("meta", {}).items():
+                self._meta[name] = tuple(meta)
+            values = self._live.setdefault(proc, self._dead.pop(proc, (0.0, {}))[1])
+            self._last_seen[proc] = time.monotonic()
+            for name, labels, op, value in message.get("updates", []):
+                key = (name, tuple(sorted(labels.items())))
+                if op == "inc":
+                    value += values.get(key, (0.0, 0.0))[0]
+                values[key] = (value, now)
+            if message.get("exit"):
+                self._retire(proc, fold=True)
+
+    def _retire(self, proc: str, fold: bool) -> None:
+        self._last_seen.pop(proc, None)
+        values = self._live.pop(proc, {})
+        # Only counters and the combined gauge modes still need a dead process' values
+        kept = {}
+        for key, value in values.items():
+            kind, mode, _ = self._meta.get(key[0], ("gauge", "all", ""))
+            if kind == "counter" or mode in ("sum", "max", "min", "mostrecent"):
+                kept[key] = value
+        if fold:
+            self._fold(kept)
+        elif kept:
+            self._dead[proc] = (time.monotonic(), kept)
+
+    def _fold(self, values: dict[tuple, tuple[float, float]]) -> None:
+        for key, (value, updated_at) in values.items():
+            if key not in self._retired:
+                self._retired[key] = (value, updated_at)
+                continue
+            current, current_at = self._retired[key]
+            kind, mode, _ = self._meta.get(key[0], ("gauge", "all", ""))
+            if kind == "counter" or mode == "sum":
+                self._retired[key] = (current + value, max(current_at, updated_at))
+            elif mode == "max":
+                self._retired[key] = max((current, current_at), (value, updated_at))
+            elif mode == "min":
+                self._retired[key] = min((current, current_at), (value, updated_at))
+            elif updated_at > current_at:
+                self._retired[key] = (value, updated_at)
+
+    def _retire_stale(self) -> None:
+        deadline = time.monotonic() - self._stale_after
+        for proc, last_seen in list(self._last_seen.items()):
+            if last_seen < deadline:
+                self._retire(proc, fold=False)
+        for proc, (retired_at, values) in list(self._dead.items()):
+            if retired_at < deadline:
+                del self._dead[proc]
+                self._fold(values)
+
+    def collect(self):
+        with self._lock:
+            self._retire_stale()
+            series: dict[str, list[tuple[str, bool, tuple, float, float]]] = (
+                defaultdict(list)
+            )
+            procs = [(proc, True, values) for proc, values in self._live.items()]
+            procs += [(proc, False, values) for proc, (_, values) in self._dead.items()]
+            procs.append(("retired", False, self._retired))
+            for proc, live, values in procs:
+                for (name, labels), (value, updated_at) in values.items():
+                    series[name].append((proc, live, labels, value, updated_at))
+            meta = dict(self._meta)
+
+        for name, samples in series.items():
+            kind, mode, documentation = meta.get(name, ("gauge", "all", ""))
+            if kind == "counter":
+                yield self._combine(
+                    CounterMetricFamily(name, documentation, labels=None),
+                    samples,
+                    "sum",
+                )
+            else:
+                if mode.startswith("live"):
+                    samples = [s for s in samples if s[1]]
+                    mode = mode[len("live") :]
+                yield self._combine(
+                    GaugeMetricFamily(name, documentation, labels=None), samples, mode
+                )
+
+    @staticmethod
+    def _combine(family, samples, mode: str):
+        if mode == "all":
+            for proc, _, labels, value, _ in samples:
+                family.add_sample(family.name, {**dict(labels), "pid": proc}, value)
+            return family
+
+        combined: dict[tuple, tuple[float, float]] = {}
+        for _, _, labels, value, updated_at in samples:
+            if labels not in combined:
+                combined[labels] = (value, updated_at)
+                continue
+            current, current_at = combined[labels]
+            if mode == "sum":
+                combined[labels] = (current + value, max(current_at, updated_at))
+            elif mode == "max":
+                combined[labels] = max((current, current_at), (value, updated_at))
+            elif mode == "min":
+                combined[labels] = min((current, current_at), (value, updated_at))
+            elif mode == "mostrecent" and updated_at > current_at:
+                combined[labels] = (value, updated_at)
+
+        sample_name = (
+            family.name + "_total" if family.type == "counter" else family.name
+        )
+        for labels, (value, _) in combined.items():
+            family.add_sample(sample_name, dict(labels), value)
+        return family
+
+
+def serve_push(aggregator: PushAggregator, path: str) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    if os.path.exists(path):
+        os.unlink(path)
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+    sock.bind(path)
+    os.chmod(path, 0o777)  # workers run as a different user in some images
+    while True:
+        data = sock.recv(1 << 20)
+        try:
+            aggregator.ingest(json.loads(data))
+        except (ValueError, KeyError, TypeError) as e:
+            print(f"Dropped malformed metrics push: {e}")
+
+
+def main() -> None:
+    registry = CollectorRegistry()
+    if TRANSPORT == "push":
+        aggregator = PushAggregator()
+        registry.register(aggregator)
+        threading.Thread(
+            target=serve_push, args=(aggregator, PUSH_SOCKET), daemon=True
+        ).start()
+        print(f"Receiving pushed agent metrics on {PUSH_SOCKET}")
+    else:
+        # Set the same multiprocess directory used by all agent workers
+        os.environ["prometheus_multiproc_dir"] = "/tmp/prometheus_multiproc"
+        # Collect from all processes
+        multiprocess.MultiProcessCollector(registry)
+
+    # Start the HTTP server (this exposes /metrics)
+    start_http_server(9100, addr="0.0.0.0", registry=registry)
+
+    print("Agent metrics aggregator running on port 9100")
+
+    # Keep the process alive
+    while True:
+        time.sleep(10)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+"""Query the session analytics database written by the agent worker.
+
+Prints p50/p95 end-of-turn latency per model and day from the ``turns`` table,
+and session count, turns and cost per model and day from the ``sessions``
+table. Both queries are answered from the (day, model, ...) indexes.
+
+Usage:
+    python analytics-query.py [DB] [--days N | --since YYYY-MM-DD [--until YYYY-MM-DD]]
+"""
+
+import argparse
+import sqlite3
+from datetime import datetime, timedelta
+
+DEFAULT_PATH = "/tmp/agent-analytics/analytics.db"
+
+# nearest-rank percentiles over each (day, model) partition
+LATENCY_QUERY = """
+WITH ranked AS (
+    SELECT
+        day,
+        model,
+        total_ms,
+        ROW_NUMBER() OVER (PARTITION BY day, model ORDER BY total_ms) AS rn,
+        COUNT(*) OVER (PARTITION BY day, model) AS n
+    FROM turns
+    WHERE day BETWEEN ? AND ? AND total_ms IS NOT NULL
+)
+SELECT
+    day,
+    model,
+    MAX(n),
+    MIN(CASE WHEN rn >= 0.50 * n THEN total_ms END),
+    MIN(CASE WHEN rn >= 0.95 * n THEN total_ms END),
+    MAX(total_ms)
+FROM ranked
+GROUP BY day, model
+ORDER BY day, model
+"""
+
+COST_QUERY = """
+SELECT
+    day,
+    model,
+    COUNT(*),
+    SUM(turns),
+    SUM(prompt_tokens + completion_tokens),
+    SUM(cost),
+    SUM(cost) / MAX(SUM(turns), 1)
+FROM sessions
+WHERE day BETWEEN ? AND ?
+GROUP BY day, model
+ORDER BY day, model
+"""
+
+
+def print_latency(conn: sqlite3.Connection, since: str, until: str) -> None:
+    rows = conn.execute(LATENCY_QUERY, (since, until)).fetchall()
+    print("End-of-turn latency (ms)")
+    if not rows:
+        print("  no turns")
+        return
+    width = max(len("model"), *(len(r[1] or "") for r in rows))
+    print(
+        f"{'day':<12}{'model':<{width + 2}}{'turns':>8}{'p50':>9}{'p95':>9}{'max':>9}"
+    )
+    for day, model, n, p50, p95, worst in rows:
+        print(
+            f"{day:<12}{model or '':<{width + 2}}{n:>8}"
+            f"{p50:>9.0f}{p95:>9.0f}{worst:>9.0f}"
+        )
+
+
+def print_cost(conn: sqlite3.Connection, since: str, until: str) -> None:
+    rows = conn.execute(COST_QUERY, (since, until)).fetchall()
+    print("\nCost (USD)")
+    if not rows:
+        print("  no sessions")
+        return
+    width = max(len("model"), *(len(r[1] or "") for r in rows))
+    print(
+        f"{'day':<12}{'model':<{width + 2}}{'sessions':>9}{'turns':>8}"
+        f"{'tokens':>11}{'cost':>11}{'per turn':>11}"
+    )
+    for day, model, sessions, turns, tokens, cost, per_turn in rows:
+        print(
+            f"{day:<12}{model or '':<{width + 2}}{sessions:>9}{turns or 0:>8}"
+            f"{tokens or 0:>11}{cost or 0:>11.4f}{per_turn or 0:>11.5f}"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("path", nargs="?", default=DEFAULT_PATH)
+    parser.add_argument("--days", type=int, default=7)
+    parser.add_argument("--since", help="first day (UTC), overrides --days")
+    parser.add_argument("--until", help="last day (UTC), default today")
+    args = parser.parse_args()
+
+    today = datetime.utcnow().date()
+    until = args.until or today.isoformat()
+    since = args.since or (today - timedelta(days=args.days - 1)).isoformat()
+
+    # read-only, so a running worker's writes are never blocked
+    conn = sqlite3.connect(f"file:{args.path}?mode=ro", uri=True)
+    try:
+        print_latency(conn, since, until)
+        print_cost(conn, since, until)
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
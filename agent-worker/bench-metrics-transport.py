@@ -0,0 +1,190 @@
+"""Benchmark metric update and scrape cost for the multiprocess and push transports.
+
+Update cost is one labelled Gauge.set or Counter.inc from a worker, the way
+MetricsManager issues them. Scrape cost is one /metrics render in agent-metrics
+with PROCS worker processes that each reported SERIES label sets per metric.
+
+Usage:
+    python bench-metrics-transport.py [--updates 100000] [--procs 50] [--series 20]
+"""
+
+import argparse
+import importlib.util
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+TMP_DIR = tempfile.mkdtemp(prefix="metrics-bench-")
+MULTIPROC_DIR = os.path.join(TMP_DIR, "multiproc")
+PUSH_SOCKET = os.path.join(TMP_DIR, "metrics.sock")
+os.makedirs(MULTIPROC_DIR)
+# prometheus_client picks its value class at import time
+os.environ["PROMETHEUS_MULTIPROC_DIR"] = MULTIPROC_DIR
+
+from prometheus_client import (  # noqa: E402
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    generate_latest,
+    multiprocess,
+    values,
+)
+
+SCRAPES = 20
+
+
+def _load(name: str, path: Path):
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)  # pyright: ignore[reportArgumentType]
+    spec.loader.exec_module(module)  # pyright: ignore[reportOptionalMemberAccess]
+    return module
+
+
+def _create_metrics(registry: CollectorRegistry) -> tuple[Gauge, Counter]:
+    gauge = Gauge(
+        "bench_latency_ms", "Benchmark gauge", ["agent_type", "room"], registry=registry
+    )
+    counter = Counter(
+        "bench_turns_total",
+        "Benchmark counter",
+        ["agent_type", "room"],
+        registry=registry,
+    )
+    return gauge, counter
+
+
+def _per_op_us(fn, n: int) -> float:
+    start = time.perf_counter()
+    for i in range(n):
+        fn(i)
+    return (time.perf_counter() - start) / n * 1e6
+
+
+def _scrape_ms(registry: CollectorRegistry) -> float:
+    start = time.perf_counter()
+    for _ in range(SCRAPES):
+        generate_latest(registry)
+    return (time.perf_counter() - start) / SCRAPES * 1000
+
+
+def bench_multiprocess(updates: int, procs: int, series: int) -> dict[str, float]:
+    gauge, counter = _create_metrics(CollectorRegistry())
+    results = {
+        "gauge set (us)": _per_op_us(
+            lambda i: gauge.labels(agent_type="bench", room="all").set(i), updates
+        ),
+        "counter inc (us)": _per_op_us(
+            lambda i: counter.labels(agent_type="bench", room="all").inc(), updates
+        ),
+    }
+
+    # Write one set of files per simulated worker process
+    default_value_class = values.ValueClass
+    try:
+        for pid in range(procs):
+            values.ValueClass = values.MultiProcessValue(
+                process_identifier=lambda pid=pid: 100000 + pid
+            )
+            gauge, counter = _create_metrics(CollectorRegistry())
+            for s in range(series):
+                gauge.labels(agent_type="bench", room=f"room-{s}").set(s)
+                counter.labels(agent_type="bench", room=f"room-{s}").inc()
+    finally:
+        values.ValueClass = default_value_class
+
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry, path=MULTIPROC_DIR)
+    results["scrape (ms)"] = _scrape_ms(registry)
+    return results
+
+
+def bench_push(
+    worker, aggregator_module, updates: int, procs: int, series: int
+) -> dict[str, float]:
+    aggregator = aggregator_module.PushAggregator(stale_after=3600)
+    threading.Thread(
+        target=aggregator_module.serve_push,
+        args=(aggregator, PUSH_SOCKET),
+        daemon=True,
+    ).start()
+    time.sleep(0.1)
+
+    config = worker.MetricsConfig(
+        transport="push", push_socket=PUSH_SOCKET, push_interval=3600
+    )
+    pusher = worker.MetricsPusher(config)
+    gauge, counter = _create_metrics(CollectorRegistry())
+    labels = {"agent_type": "bench", "room": "all"}
+    results = {
+        "gauge set (us)": _per_op_us(
+            lambda i: worker._PushChild(pusher, gauge, labels).set(i), updates
+        ),
+        "counter inc (us)": _per_op_us(
+            lambda i: worker._PushChild(pusher, counter, labels).inc(), updates
+        ),
+    }
+    start = time.perf_counter()
+    pusher.flush()
+    results["flush (ms)"] = (time.perf_counter() - start) * 1000
+    pusher.close()
+
+    for pid in range(procs):
+        aggregator.ingest(
+            {
+                "proc": f"bench:{pid}",
+                "meta": {
+                    "bench_latency_ms": ["gauge", "all", "Benchmark gauge"],
+                    "bench_turns": ["counter", "all", "Benchmark counter"],
+                },
+                "updates": [
+                    [name, {"agent_type": "bench", "room": f"room-{s}"}, op, s]
+                    for s in range(series)
+                    for name, op in (
+                        ("bench_latency_ms", "set"),
+                        ("bench_turns", "inc"),
+                    )
+                ],
+            }
+        )
+    registry = CollectorRegistry()
+    registry.register(aggregator)
+    results["scrape (ms)"] = _scrape_ms(registry)
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--updates", type=int, default=100_000)
+    parser.add_argument("--procs", type=int, default=50)
+    parser.add_argument("--series", type=int, default=20)
+    args = parser.parse_args()
+
+    here = Path(__file__).resolve().parent
+    worker = _load("fast_preresponse", here / "fast-preresponse.py")
+    aggregator_module = _load(
+        "agent_metrics", here.parent / "agent-metrics" / "agent-metrics.py"
+    )
+
+    results = {
+        "multiprocess": bench_multiprocess(args.updates, args.procs, args.series),
+        "push": bench_push(
+            worker, aggregator_module, args.updates, args.procs, args.series
+        ),
+    }
+    print(
+        f"{args.updates} updates, scrape of {args.procs} processes x "
+        f"{args.series} series per metric\n"
+    )
+    print(f"{'':<18}{'multiprocess':>14}{'push':>14}")
+    for key in ("gauge set (us)", "counter inc (us)", "flush (ms)", "scrape (ms)"):
+        cells = "".join(
+            f"{results[t][key]:>14.3f}" if key in results[t] else f"{'-':>14}"
+            for t in ("multiprocess", "push")
+        )
+        print(f"{key:<18}{cells}")
+
+
+if __name__ == "__main__":
+    main()
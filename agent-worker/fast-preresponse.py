@@ -1,28 +1,54 @@
 import asyncio
 import atexit
+import contextlib
+import fcntl
+import hashlib
 import inspect
 import json
 import logging
+import logging.handlers
+import mmap
 import os
+import queue
+import random
+import re
+import secrets
+import socket
+import sqlite3
+import statistics
+import struct
+import threading
 import time
-from collections.abc import AsyncIterable
+from collections import defaultdict, deque
+from collections.abc import AsyncIterable, AsyncIterator
 from datetime import datetime
-from typing import Literal, Type, cast
+from typing import Iterator, Literal, Type, TypeVar, cast
 
+import numpy as np
 from dotenv import load_dotenv
+from livekit import rtc
 from livekit.agents import (
     Agent,
     AgentSession,
+    AgentStateChangedEvent,
     AutoSubscribe,
+    ConversationItemAddedEvent,
     JobContext,
+    NOT_GIVEN,
+    io,
     JobProcess,
     MetricsCollectedEvent,
+    ModelSettings,
+    SpeechHandle,
+    UserInputTranscribedEvent,
+    UserStateChangedEvent,
     WorkerOptions,
     cli,
     llm,
     metrics,
     stt,
     tts,
+    vad,
 )
 from livekit.agents.llm.chat_context import ChatContext, ChatMessage
 from livekit.agents.metrics import (
@@ -33,7 +59,10 @@ from livekit.agents.metrics import (
     TTSMetrics,
     VADMetrics,
 )
+from livekit.agents.utils import http_context
+from livekit.agents.voice.agent_activity import _SpeechHandleContextVar
 from livekit.plugins import aws, deepgram, elevenlabs, groq, openai, silero
+from openai import AsyncOpenAI
 from prometheus_client import CollectorRegistry, Counter, Gauge, multiprocess
 from pydantic import BaseModel, Field
 from pydantic_settings import BaseSettings, SettingsConfigDict
@@ -56,6 +85,9 @@ class LLMConfig(BaseModel):
     api_key: str | None = None
     cost_per_input_token: float = 0.0
     cost_per_output_token: float = 0.0
+    # gateway limits for this model, shared by all job processes on the node
+    requests_per_second: float | None = None
+    tokens_per_minute: float | None = None
 
 
 class STTConfig(BaseModel):
@@ -82,6 +114,138 @@ class VADConfig(BaseModel):
     activation_threshold: float = 0.3
 
 
+class EndpointingConfig(BaseModel):
+    # session defaults: wait min_delay after the end of speech before ending the
+    # turn, or max_delay when the turn detector thinks the user isn't done
+    min_delay: float = 0.5
+    max_delay: float = 6.0
+    # combine the local turn-detector model's end-of-turn probability with VAD silence
+    turn_detector: bool = False
+    # learn min_delay from the caller's pauses within a turn
+    adaptive: bool = False
+    floor: float = 0.3
+    ceiling: float = 1.5
+    quantile: float = 0.9  # share of the caller's pauses the delay should outlast
+    window: int = 30  # recent pauses used
+    min_samples: int = 5
+    # a turn the user continues within false_cut_window seconds was cut too early
+    false_cut_window: float = 1.0
+    max_false_cut_rate: float = 0.05
+    margin_step: float = 0.05  # seconds added to the delay per false cut
+
+
+class AudioProbeConfig(BaseModel):
+    # timestamp what the caller hears at the audio output
+    enabled: bool = False
+    # peak int16 amplitude a frame must exceed to count as audible
+    silence_threshold: int = 300
+    # gaps in the output shorter than this are frame pacing jitter, not underruns
+    underrun_tolerance: float = 0.02
+
+
+class RecorderConfig(BaseModel):
+    enabled: bool = False
+    directory: str = "/tmp/agent-recordings"
+    segment_bytes: int = 4 * 1024 * 1024
+    record_audio: bool = True
+
+
+class MetricsConfig(BaseModel):
+    # "full" labels per-room series with the room name, "drop" labels every
+    # series "all". Room names are per call, so there is no stable top-K to keep.
+    room_label: Literal["full", "drop"] = "drop"
+    # per metric, over every process sharing prometheus_multiproc_dir
+    max_label_sets: int = 1000
+    # "multiprocess" writes prometheus_client mmap files to prometheus_multiproc_dir,
+    # "push" batches updates in memory and sends them to agent-metrics over push_socket
+    transport: Literal["multiprocess", "push"] = "multiprocess"
+    push_socket: str = "/tmp/agent-metrics/metrics.sock"
+    push_interval: float = 1.0
+
+
+class TracingConfig(BaseModel):
+    enabled: bool = False
+    directory: str = "/tmp/agent-traces"
+    max_bytes: int = 50 * 1024 * 1024
+    backup_count: int = 5
+
+
+class FillerGateConfig(BaseModel):
+    enabled: bool = False
+    # only speak a filler when the answer is predicted to start later than this
+    threshold_ms: float = 800.0
+    window: int = 50  # recent answers used for the estimate
+    min_samples: int = 5  # always speak a filler until this many answers were seen
+    # recent answers shared by all job processes on the node
+    path: str = "/tmp/agent-filler-gate/samples"
+
+
+class SemanticCacheConfig(BaseModel):
+    enabled: bool = False
+    # OpenAI-compatible embeddings endpoint
+    embedding_model: str = "text-embedding-3-small"
+    base_url: str | None = None
+    api_key: str | None = None
+    # cacheable intents, each with example questions, e.g.
+    # {"opening_hours": ["when are you open", "what are your opening hours"]}
+    intents: dict[str, list[str]] = {}
+    intent_threshold: float = 0.75  # min similarity to an intent example
+    threshold: float = 0.92  # min similarity to a cached question for a hit
+    max_question_chars: int = 200
+    max_answer_chars: int = 1000  # longer answers are not cached
+    max_entries: int = 1000
+    ttl: float = 3600.0
+    # entries and intent embeddings shared by all job processes on the node
+    path: str = "/tmp/agent-semantic-cache"
+    prime_timeout: float = 10.0  # for embedding the intent examples in prewarm
+    lookup_timeout: float = 0.3  # treat a slower embedding call as a miss
+    # share of hits re-asked to the primary LLM, and the min similarity between
+    # the cached and the fresh answer for the hit to count as correct
+    audit_rate: float = 0.05
+    audit_threshold: float = 0.8
+
+
+class RateLimitConfig(BaseModel):
+    enabled: bool = False
+    path: str = "/tmp/agent-ratelimit/buckets"
+    # share of every bucket the filler must leave for the primary LLM
+    filler_reserve: float = 0.2
+    # seconds the filler may wait for its bucket before it is skipped
+    filler_max_wait: float = 0.0
+    # seconds the primary LLM waits at most before it is sent anyway
+    primary_max_wait: float = 5.0
+
+
+class AnalyticsConfig(BaseModel):
+    enabled: bool = False
+    path: str = "/tmp/agent-analytics/analytics.db"
+    batch_size: int = 500  # rows per transaction
+    flush_interval: float = 2.0  # seconds a row may wait in the buffer
+
+
+class TurnBudgetConfig(BaseModel):
+    # seconds from the start of a reply (or of its next tool step) until every stage
+    # produced its first output
+    deadline: float = 10.0
+    # seconds a stream may stall between two chunks once it started
+    stall_timeout: float = 5.0
+    # seconds the filler LLM gets for its first token
+    filler_deadline: float = 1.0
+    # when the filler misses its deadline, say nothing ("skip") or fallback_text
+    filler_fallback: Literal["skip", "static"] = "skip"
+    fallback_text: str = "One moment."
+
+
+class GreetingConfig(BaseModel):
+    text: str = "Hi there, how are you doing today?"
+    # seconds to wait for the audio tracks before greeting anyway
+    ready_timeout: float = 3.0
+    # synthesize the greeting once per process in prewarm, before a job arrives
+    presynthesize: bool = True
+    # seconds prewarm waits for the greeting audio, below initialize_process_timeout
+    presynthesize_timeout: float = 5.0
+
+
 class AppConfig(BaseSettings):
     def model_post_init(self, __context) -> None:
         import os
@@ -200,6 +364,17 @@ You MUST format the following entities as specified to ensure correct TTS pronun
         cost_per_character=0.015 / 1000,
     )
     vad: VADConfig = VADConfig(min_silence_duration=0.3, activation_threshold=0.4)
+    endpointing: EndpointingConfig = EndpointingConfig()
+    audio_probe: AudioProbeConfig = AudioProbeConfig()
+    metrics: MetricsConfig = MetricsConfig()
+    recorder: RecorderConfig = RecorderConfig()
+    greeting: GreetingConfig = GreetingConfig()
+    tracing: TracingConfig = TracingConfig()
+    filler_gate: FillerGateConfig = FillerGateConfig()
+    turn_budget: TurnBudgetConfig = TurnBudgetConfig()
+    analytics: AnalyticsConfig = AnalyticsConfig()
+    semantic_cache: SemanticCacheConfig = SemanticCacheConfig()
+    rate_limit: RateLimitConfig = RateLimitConfig()
 
 
 # --- Plugin Registry ---
@@ -239,6 +414,8 @@ class PluginRegistry:
                 "cost_per_output_token",
                 "cost_per_second",
                 "cost_per_character",
+                "requests_per_second",
+                "tokens_per_minute",
             },
             exclude_none=True,
         )  # Exclude None values like an unset base_url
@@ -261,10 +438,1222 @@ class PluginRegistry:
         return cast(tts.TTS, self._create_plugin(self._tts_registry, config))
 
 
+# --- Tracing ---
+class SharedRotatingFileHandler(logging.Handler):
+    """Appends records to one file shared by every job process on the node.
+
+    Writes and rotation happen under an exclusive ``flock`` on a lock file next
+    to it, and the size is read from the file itself, so ``max_bytes`` and
+    ``backup_count`` bound the disk use of all processes together.
+    """
+
+    def __init__(self, path: str, max_bytes: int, backup_count: int):
+        super().__init__()
+        self._path = path
+        self._max_bytes = max_bytes
+        self._backup_count = backup_count
+        directory, name = os.path.split(path)
+        self._lock_fd = os.open(
+            os.path.join(directory, f".{name}.lock"), os.O_RDWR | os.O_CREAT, 0o666
+        )
+
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            line = (self.format(record) + "\n").encode()
+            fcntl.flock(self._lock_fd, fcntl.LOCK_EX)
+            try:
+                with contextlib.suppress(FileNotFoundError):
+                    size = os.stat(self._path).st_size
+                    if size and size + len(line) > self._max_bytes:
+                        self._rotate()
+                fd = os.open(self._path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o666)
+                try:
+                    os.write(fd, line)
+                finally:
+                    os.close(fd)
+            finally:
+                fcntl.flock(self._lock_fd, fcntl.LOCK_UN)
+        except Exception:
+            self.handleError(record)
+
+    def _rotate(self) -> None:
+        if self._backup_count <= 0:
+            os.remove(self._path)
+            return
+        for index in range(self._backup_count - 1, 0, -1):
+            with contextlib.suppress(FileNotFoundError):
+                os.replace(f"{self._path}.{index}", f"{self._path}.{index + 1}")
+        os.replace(self._path, f"{self._path}.1")
+
+
+class SpanExporter:
+    """Writes OTLP/JSON ``resourceSpans`` lines to a rotating file on a background thread.
+
+    All job processes append to the same ``spans.jsonl``, so the rotation
+    limits hold for the node rather than for each short-lived job process.
+    """
+
+    _instances: dict[str, "SpanExporter"] = {}
+
+    def __init__(self, config: TracingConfig):
+        os.makedirs(config.directory, exist_ok=True)
+        handler = SharedRotatingFileHandler(
+            os.path.join(config.directory, "spans.jsonl"),
+            config.max_bytes,
+            config.backup_count,
+        )
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._listener = logging.handlers.QueueListener(self._queue, handler)
+        self._listener.start()
+        atexit.register(self._listener.stop)
+
+    @classmethod
+    def get(cls, config: TracingConfig) -> "SpanExporter":
+        if config.directory not in cls._instances:
+            cls._instances[config.directory] = cls(config)
+        return cls._instances[config.directory]
+
+    def export(self, resource: dict, spans: list[dict]) -> None:
+        line = json.dumps(
+            {
+                "resourceSpans": [
+                    {
+                        "resource": {"attributes": _otlp_attributes(resource)},
+                        "scopeSpans": [
+                            {"scope": {"name": "pre-response-agent"}, "spans": spans}
+                        ],
+                    }
+                ]
+            }
+        )
+        self._queue.put_nowait(logging.makeLogRecord({"msg": line}))
+
+
+def _otlp_attributes(attrs: dict) -> list[dict]:
+    result = []
+    for key, value in attrs.items():
+        if value is None:
+            continue
+        if isinstance(value, bool):
+            otlp_value = {"boolValue": value}
+        elif isinstance(value, int):
+            otlp_value = {"intValue": str(value)}
+        elif isinstance(value, float):
+            otlp_value = {"doubleValue": value}
+        else:
+            otlp_value = {"stringValue": str(value)}
+        result.append({"key": key, "value": otlp_value})
+    return result
+
+
+class SessionTracer:
+    """Span tracing for one session: a session span, one span per turn, stage spans.
+
+    Stage spans are recorded with explicit epoch start/end times, since most of
+    them are reconstructed from metrics events after the fact. A turn and its
+    stages are exported as one line when the next turn begins or the session ends.
+    """
+
+    def __init__(self, exporter: SpanExporter, resource: dict):
+        self._exporter = exporter
+        self._resource = resource
+        self._trace_id = secrets.token_hex(16)
+        self._session_span_id = secrets.token_hex(8)
+        self._session_start = time.time()
+        self._turn: dict | None = None
+        self._turn_spans: list[dict] = []
+        self._turn_index = 0
+        self._playout_start: float | None = None
+
+    @classmethod
+    def for_session(cls, config: TracingConfig, resource: dict) -> "SessionTracer":
+        return cls(SpanExporter.get(config), resource)
+
+    def _span(
+        self, name: str, start: float, end: float, parent: str, attrs: dict
+    ) -> dict:
+        return {
+            "traceId": self._trace_id,
+            "spanId": secrets.token_hex(8),
+            "parentSpanId": parent,
+            "name": name,
+            "kind": 1,  # SPAN_KIND_INTERNAL
+            "startTimeUnixNano": str(int(start * 1e9)),
+            "endTimeUnixNano": str(int(end * 1e9)),
+            "attributes": _otlp_attributes(attrs),
+        }
+
+    def begin_turn(self, **attrs) -> None:
+        self._end_turn()
+        self._turn_index += 1
+        self._turn = {
+            "span_id": secrets.token_hex(8),
+            "start": time.time(),
+            "attrs": {"turn.index": self._turn_index, **attrs},
+        }
+
+    def record(self, name: str, start: float, end: float, **attrs) -> None:
+        if self._turn is not None:
+            parent = self._turn["span_id"]
+            self._turn["start"] = min(self._turn["start"], start)
+        else:
+            parent = self._session_span_id
+        span = self._span(name, start, end, parent, attrs)
+        if self._turn is not None:
+            self._turn_spans.append(span)
+        else:
+            self._exporter.export(self._resource, [span])
+
+    def _end_turn(self) -> None:
+        if self._turn is None:
+            return
+        end = max(
+            [int(s["endTimeUnixNano"]) / 1e9 for s in self._turn_spans],
+            default=time.time(),
+        )
+        turn_span = self._span(
+            "turn", self._turn["start"], end, self._session_span_id, self._turn["attrs"]
+        )
+        turn_span["spanId"] = self._turn["span_id"]
+        self._exporter.export(self._resource, [turn_span, *self._turn_spans])
+        self._turn = None
+        self._turn_spans = []
+
+    def attach(self, session: AgentSession) -> None:
+        @session.on("agent_state_changed")
+        def _on_agent_state(ev: AgentStateChangedEvent) -> None:
+            if ev.new_state == "speaking":
+                self._playout_start = ev.created_at
+            elif ev.old_state == "speaking" and self._playout_start is not None:
+                self.record("playout", self._playout_start, ev.created_at)
+                self._playout_start = None
+
+    async def aclose(self) -> None:
+        self._end_turn()
+        self._exporter.export(
+            self._resource,
+            [
+                {
+                    **self._span(
+                        "session",
+                        self._session_start,
+                        time.time(),
+                        "",
+                        {"session.turns": self._turn_index},
+                    ),
+                    "spanId": self._session_span_id,
+                }
+            ],
+        )
+
+
+# --- Filler Gating ---
+class FillerGateHistory:
+    """Recent filler gate samples shared by every job process on the node.
+
+    Samples are kept in a ring of ``2 * window`` fixed-size records in a small
+    memory-mapped file, read and written under an exclusive ``flock``, so a new
+    session starts from the answers observed in earlier ones.
+    """
+
+    # next sequence number
+    HEADER = struct.Struct("<Q")
+    # sequence number (0 for an empty record), kind, two features, value
+    RECORD = struct.Struct("<QBddd")
+    LLM, TTS = 0, 1
+
+    def __init__(self, path: str, window: int):
+        self._slots = 2 * window
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        size = self.HEADER.size + self.RECORD.size * self._slots
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o666)
+        with self._locked():
+            if os.fstat(self._fd).st_size != size:
+                # a different window: start over
+                os.ftruncate(self._fd, 0)
+                os.ftruncate(self._fd, size)
+        self._map = mmap.mmap(self._fd, size)
+
+    @contextlib.contextmanager
+    def _locked(self) -> Iterator[None]:
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def load(self) -> list[tuple[int, float, float, float]]:
+        """Every stored ``(kind, x1, x2, value)``, oldest first."""
+        with self._locked():
+            records = [
+                self.RECORD.unpack_from(
+                    self._map, self.HEADER.size + slot * self.RECORD.size
+                )
+                for slot in range(self._slots)
+            ]
+        return [record[1:] for record in sorted(records) if record[0]]
+
+    def append(self, kind: int, x1: float, x2: float, value: float) -> None:
+        with self._locked():
+            (seq,) = self.HEADER.unpack_from(self._map, 0)
+            seq += 1
+            offset = self.HEADER.size + (seq % self._slots) * self.RECORD.size
+            self.RECORD.pack_into(self._map, offset, seq, kind, x1, x2, value)
+            self.HEADER.pack_into(self._map, 0, seq)
+
+
+class FillerGate:
+    """Predicts how long the answer will take to start and decides whether a filler is worth it.
+
+    The primary LLM TTFT is modelled as a linear function of the context and the
+    user's utterance size, fitted by least squares over a rolling window of
+    recent answers on the node, plus the median TTS TTFB. Both sizes are the
+    estimates the decision is made on, so the fit and the prediction agree. Each
+    decision is later scored against the observed latency.
+    """
+
+    def __init__(self, config: FillerGateConfig):
+        self._config = config
+        # (context tokens, utterance tokens, ttft)
+        self._ttft_samples: deque[tuple[float, float, float]] = deque(
+            maxlen=config.window
+        )
+        self._tts_samples: deque[float] = deque(maxlen=config.window)
+        self._pending: dict | None = None
+        self._history: FillerGateHistory | None = None
+        if config.enabled:
+            try:
+                self._history = FillerGateHistory(config.path, config.window)
+            except OSError as e:
+                logger.warning(f"Filler gate history unavailable: {e}")
+        if self._history is not None:
+            for kind, x1, x2, value in self._history.load():
+                if kind == FillerGateHistory.LLM:
+                    self._ttft_samples.append((x1, x2, value))
+                else:
+                    self._tts_samples.append(value)
+
+    def predict(self, context_tokens: int, utterance_tokens: int) -> float | None:
+        """Predicted end-of-turn to first answer audio delay in ms, None while warming up."""
+        if len(self._ttft_samples) < self._config.min_samples:
+            return None
+        samples = np.array(self._ttft_samples)
+        features, ttfts = samples[:, :2], samples[:, 2]
+        means = features.mean(axis=0)
+        centered = features - means
+        slopes = np.linalg.lstsq(centered, ttfts - ttfts.mean(), rcond=None)[0]
+        # more tokens never make the answer faster
+        slopes = np.maximum(slopes, 0.0)
+        ttft = ttfts.mean() + float(
+            slopes @ (np.array([context_tokens, utterance_tokens]) - means)
+        )
+        tts_ttfb = statistics.median(self._tts_samples) if self._tts_samples else 0.0
+        return max(ttft, 0.0) * 1000 + tts_ttfb * 1000
+
+    def decide(
+        self, context_tokens: int, utterance_tokens: int
+    ) -> tuple[bool, float | None]:
+        predicted_ms = self.predict(context_tokens, utterance_tokens)
+        emit = predicted_ms is None or predicted_ms > self._config.threshold_ms
+        self._pending = {
+            "emit": emit,
+            "predicted_ms": predicted_ms,
+            "features": (context_tokens, utterance_tokens),
+        }
+        return emit, predicted_ms
+
+    def observe_llm(self, ttft: float) -> dict | None:
+        # only the first answer after a decision has known features, tool
+        # follow-ups and answers without a decision are not samples
+        if self._pending is None or "ttft" in self._pending:
+            return None
+        self._pending["ttft"] = ttft
+        sample = (*self._pending["features"], ttft)
+        self._ttft_samples.append(sample)
+        if self._history is not None:
+            self._history.append(FillerGateHistory.LLM, *sample)
+        return self._resolve()
+
+    def observe_tts(self, ttfb: float) -> dict | None:
+        self._tts_samples.append(ttfb)
+        if self._history is not None:
+            self._history.append(FillerGateHistory.TTS, 0.0, 0.0, ttfb)
+        if self._pending is not None:
+            self._pending.setdefault("tts_ttfb", ttfb)
+        return self._resolve()
+
+    def _resolve(self) -> dict | None:
+        """Score the pending decision once the answer's TTFT and TTFB are known."""
+        pending = self._pending
+        if pending is None or "ttft" not in pending or "tts_ttfb" not in pending:
+            return None
+        self._pending = None
+        actual_ms = (pending["ttft"] + pending["tts_ttfb"]) * 1000
+        slow = actual_ms > self._config.threshold_ms
+        if pending["emit"]:
+            outcome = "correct" if slow else "unneeded"
+        else:
+            outcome = "missed" if slow else "correct"
+        return {
+            "decision": "emit" if pending["emit"] else "skip",
+            "outcome": outcome,
+            "predicted_ms": pending["predicted_ms"],
+            "actual_ms": actual_ms,
+        }
+
+
+# --- Turn Scope ---
+T = TypeVar("T")
+
+
+class TurnStopped(Exception):
+    """A guarded stream was closed because its turn timed out or was cancelled."""
+
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason
+
+
+class TurnScope:
+    """Deadline and cancellation scope shared by every stage of one speech.
+
+    Stages iterate their provider streams through ``guard``. It closes the stream
+    and raises ``TurnStopped`` when a stage has produced nothing by the
+    deadline, stalls for longer than ``stall_timeout`` or the scope is cancelled
+    by a newer turn or the session closing.
+    """
+
+    def __init__(self, config: TurnBudgetConfig):
+        self._budget = config.deadline
+        self._deadline = time.monotonic() + config.deadline
+        self._stall_timeout = config.stall_timeout
+        self._cancelled = asyncio.Event()
+        self.cancel_reason: str | None = None
+
+    def remaining(self) -> float:
+        return max(0.0, self._deadline - time.monotonic())
+
+    def restart(self) -> None:
+        """Start a new deadline for the next generation step, e.g. after tool calls."""
+        self._deadline = time.monotonic() + self._budget
+
+    def cancel(self, reason: str) -> None:
+        if self.cancel_reason is None:
+            self.cancel_reason = reason
+            self._cancelled.set()
+
+    async def guard(
+        self, source: AsyncIterable[T], first_item_timeout: float | None = None
+    ) -> AsyncIterator[T]:
+        iterator = aiter(source)
+        cancelled = asyncio.ensure_future(self._cancelled.wait())
+        step: asyncio.Future[T] | None = None
+        first = True
+        try:
+            while True:
+                if first:
+                    timeout = self.remaining()
+                    if first_item_timeout is not None:
+                        timeout = min(timeout, first_item_timeout)
+                else:
+                    timeout = self._stall_timeout
+                step = asyncio.ensure_future(anext(iterator))
+                done, _ = await asyncio.wait(
+                    {step, cancelled},
+                    timeout=timeout,
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                if step not in done:
+                    if cancelled in done:
+                        raise TurnStopped(cast(str, self.cancel_reason))
+                    raise TurnStopped("deadline" if first else "stall")
+                try:
+                    item = step.result()
+                except StopAsyncIteration:
+                    return
+                finally:
+                    step = None
+                first = False
+                yield item
+        finally:
+            cancelled.cancel()
+            if step is not None:
+                # the source must be idle before it can be closed
+                step.cancel()
+                await asyncio.wait({step})
+                if not step.cancelled():
+                    step.exception()
+            aclose = getattr(iterator, "aclose", None)
+            if aclose is not None:
+                await aclose()
+
+
+# --- Rate Limiting ---
+class RateLimiter:
+    """Token buckets per provider and model, shared by every job process on the node.
+
+    The buckets live in a small memory-mapped file and are only read and updated
+    under an exclusive ``flock``. Each bucket holds a requests-per-second and a
+    tokens-per-minute level, refilled from the time of its last update. The
+    primary LLM may drain a bucket and waits for it to refill; the filler must
+    leave ``filler_reserve`` of each capacity and is skipped when it cannot get
+    through within ``filler_max_wait``.
+    """
+
+    # key hash, request level, token level, last update (epoch seconds)
+    SLOT = struct.Struct("<Qddd")
+    SLOTS = 256
+
+    _instance: "RateLimiter | None" = None
+
+    def __init__(self, config: RateLimitConfig):
+        self._config = config
+        self._pid = os.getpid()
+        os.makedirs(os.path.dirname(config.path) or ".", exist_ok=True)
+        size = self.SLOT.size * self.SLOTS
+        self._fd = os.open(config.path, os.O_RDWR | os.O_CREAT, 0o666)
+        with self._locked():
+            if os.fstat(self._fd).st_size < size:
+                os.ftruncate(self._fd, size)
+        self._map = mmap.mmap(self._fd, size)
+
+    @classmethod
+    def get(cls, config: RateLimitConfig) -> "RateLimiter":
+        if cls._instance is None or cls._instance._pid != os.getpid():
+            cls._instance = cls(config)
+        return cls._instance
+
+    @staticmethod
+    def bucket_key(config: LLMConfig) -> str:
+        return f"{config.provider}:{config.base_url or ''}:{config.model}"
+
+    @contextlib.contextmanager
+    def _locked(self) -> Iterator[None]:
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def _take(self, key: str, config: LLMConfig, tokens: int, reserve: float) -> float:
+        """Take one request and ``tokens`` from the bucket, or return the seconds to wait."""
+        rps = config.requests_per_second
+        tpm = config.tokens_per_minute
+        # below one request per second the bucket must still hold a whole request
+        capacity = max(1.0, rps or 0.0)
+        key_hash = (
+            int.from_bytes(
+                hashlib.blake2b(key.encode(), digest_size=8).digest(), "little"
+            )
+            or 1
+        )
+        with self._locked():
+            for slot in range(self.SLOTS):
+                offset = slot * self.SLOT.size
+                stored, requests, budget, updated = self.SLOT.unpack_from(
+                    self._map, offset
+                )
+                if stored in (key_hash, 0):
+                    break
+            else:
+                logger.warning(f"No free rate limit bucket for {key}")
+                return 0.0
+
+            now = time.time()
+            if stored == 0:
+                requests, budget, updated = capacity, tpm or 0.0, now
+            elapsed = max(0.0, now - updated)
+            wait = 0.0
+            if rps:
+                requests = min(capacity, requests + elapsed * rps)
+                needed = min(1, capacity * (1 - reserve)) + reserve * capacity
+                wait = max(wait, (needed - requests) / rps)
+            if tpm:
+                budget = min(tpm, budget + elapsed * tpm / 60)
+                # a request larger than the whole bucket only needs a full bucket
+                needed = min(tokens, tpm * (1 - reserve)) + reserve * tpm
+                wait = max(wait, (needed - budget) / (tpm / 60))
+            if wait <= 0:
+                requests -= 1 if rps else 0
+                budget -= tokens if tpm else 0
+            self.SLOT.pack_into(self._map, offset, key_hash, requests, budget, now)
+        return max(0.0, wait)
+
+    async def acquire(
+        self, config: LLMConfig, tokens: int, priority: str, max_wait: float
+    ) -> float | None:
+        """Wait for the bucket of ``config``; the seconds waited, or None on giving up."""
+        if not config.requests_per_second and not config.tokens_per_minute:
+            return 0.0
+        key = self.bucket_key(config)
+        reserve = 0.0 if priority == "primary" else self._config.filler_reserve
+        start = time.monotonic()
+        while True:
+            wait = self._take(key, config, tokens, reserve)
+            waited = time.monotonic() - start
+            if wait == 0:
+                return waited
+            if waited + wait > max_wait:
+                return None
+            await asyncio.sleep(wait)
+
+
+# --- Semantic Cache ---
+class SemanticCache:
+    """Answers to recent questions of allow-listed intents, matched by embedding similarity.
+
+    A question is only cacheable when it is close enough to one of the configured
+    intent examples, and a hit must be of the same intent. The entries are shared
+    by every job process on the node: unit-normalized question embeddings,
+    entry metadata and answers live in a memory-mapped file that is only read
+    and written under an exclusive ``flock``, so a lookup is a single
+    matrix-vector product over the node's entries. Entries expire after ``ttl``
+    seconds and the least recently used entry is evicted when the cache is
+    full. The intent examples are embedded once per node, normally in prewarm,
+    and stored next to the entries.
+    """
+
+    # magic, embedding dimension, slots, answer bytes per slot, next entry id
+    HEADER = struct.Struct("<4sIIIq")
+    HEADER_SIZE = 64
+    MAGIC = b"SCv1"
+    ENTRY = np.dtype(
+        [("id", "<i8"), ("intent", "<i4"), ("expires", "<f8"), ("last_used", "<f8")]
+    )
+    ANSWER_LENGTH = struct.Struct("<I")
+
+    _instance: "SemanticCache | None" = None
+
+    def __init__(self, config: SemanticCacheConfig):
+        self._config = config
+        self._pid = os.getpid()
+        self._client = AsyncOpenAI(api_key=config.api_key, base_url=config.base_url)
+        self._priming: asyncio.Task | None = None
+        self._intent_names = [
+            name for name, texts in config.intents.items() for _ in texts
+        ]
+        self._intent_vectors: np.ndarray | None = None
+        self._answer_bytes = 4 * config.max_answer_chars
+        self._fd: int | None = None
+        self._map: mmap.mmap | None = None
+        self._vectors: np.ndarray | None = None
+        self._entries: np.ndarray | None = None
+        self._answers_offset = 0
+
+    @classmethod
+    def get(cls, config: SemanticCacheConfig) -> "SemanticCache":
+        if cls._instance is None or cls._instance._pid != os.getpid():
+            cls._instance = cls(config)
+        return cls._instance
+
+    @staticmethod
+    def _file(config: SemanticCacheConfig, kind: str) -> str:
+        """Path of the ``kind`` file for the configured model and intents."""
+        key = hashlib.blake2b(
+            json.dumps([config.embedding_model, config.intents]).encode(),
+            digest_size=8,
+        ).hexdigest()
+        suffix = "npy" if kind == "intents" else "bin"
+        return os.path.join(config.path, f"{kind}-{key}.{suffix}")
+
+    @staticmethod
+    async def _embed(client: AsyncOpenAI, model: str, texts: list[str]) -> np.ndarray:
+        response = await client.embeddings.create(model=model, input=texts)
+        vectors = np.array([d.embedding for d in response.data], dtype=np.float32)
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    async def embed(self, texts: list[str]) -> np.ndarray:
+        return await self._embed(self._client, self._config.embedding_model, texts)
+
+    @staticmethod
+    def _read_intents(path: str) -> np.ndarray | None:
+        try:
+            return np.load(path)
+        except (OSError, ValueError):
+            return None
+
+    @staticmethod
+    def _write_intents(path: str, vectors: np.ndarray) -> None:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            np.save(f, vectors)
+        # readers never see a partly written file
+        os.replace(tmp, path)
+
+    @classmethod
+    def prepare(cls, config: SemanticCacheConfig) -> None:
+        """Embed the intent examples for the node unless another process already has.
+
+        Meant for prewarm, which runs before the job's event loop. Processes
+        prewarming at the same time wait for the first one instead of embedding
+        the examples again.
+        """
+        texts = [text for texts in config.intents.values() for text in texts]
+        if not texts:
+            return
+        path = cls._file(config, "intents")
+        os.makedirs(config.path, exist_ok=True)
+        fd = os.open(
+            os.path.join(config.path, ".intents.lock"), os.O_RDWR | os.O_CREAT, 0o666
+        )
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            if cls._read_intents(path) is not None:
+                return
+
+            async def _embed_examples() -> np.ndarray:
+                async with AsyncOpenAI(
+                    api_key=config.api_key, base_url=config.base_url
+                ) as client:
+                    return await cls._embed(client, config.embedding_model, texts)
+
+            vectors = asyncio.run(
+                asyncio.wait_for(_embed_examples(), config.prime_timeout)
+            )
+            cls._write_intents(path, vectors)
+        finally:
+            # closing the file releases the lock
+            os.close(fd)
+
+    def prime(self) -> None:
+        """Load the node's intent embeddings, embedding them in the background if missing."""
+        if self._intent_vectors is not None or (
+            self._priming is not None and not self._priming.done()
+        ):
+            return
+        vectors = self._read_intents(self._file(self._config, "intents"))
+        if vectors is not None and len(vectors) == len(self._intent_names):
+            self._use_intents(vectors)
+        else:
+            self._priming = asyncio.create_task(self._load_intents())
+
+    async def _load_intents(self) -> None:
+        examples = [text for texts in self._config.intents.values() for text in texts]
+        try:
+            vectors = (
+                await self.embed(examples)
+                if examples
+                else np.zeros((0, 1), dtype=np.float32)
+            )
+        except Exception as e:
+            logger.warning(f"Embedding the semantic cache intents failed: {e}")
+            return
+        if examples:
+            try:
+                self._write_intents(self._file(self._config, "intents"), vectors)
+            except OSError as e:
+                logger.warning(f"Storing the semantic cache intents failed: {e}")
+        self._use_intents(vectors)
+
+    def _use_intents(self, vectors: np.ndarray) -> None:
+        self._intent_vectors = vectors
+        if len(vectors):
+            try:
+                self._open_entries(vectors.shape[1])
+            except OSError as e:
+                logger.warning(f"Semantic cache entries unavailable: {e}")
+
+    def _open_entries(self, dim: int) -> None:
+        slots = self._config.max_entries
+        vectors_size = slots * dim * 4
+        entries_size = slots * self.ENTRY.itemsize
+        answers_size = slots * (self.ANSWER_LENGTH.size + self._answer_bytes)
+        size = self.HEADER_SIZE + vectors_size + entries_size + answers_size
+        layout = (self.MAGIC, dim, slots, self._answer_bytes)
+        os.makedirs(self._config.path, exist_ok=True)
+        self._fd = os.open(
+            self._file(self._config, "entries"), os.O_RDWR | os.O_CREAT, 0o666
+        )
+        with self._locked():
+            header = os.pread(self._fd, self.HEADER.size, 0)
+            if (
+                os.fstat(self._fd).st_size != size
+                or self.HEADER.unpack(header)[:4] != layout
+            ):
+                # a new file or a different layout: start over
+                os.ftruncate(self._fd, 0)
+                os.ftruncate(self._fd, size)
+                os.pwrite(self._fd, self.HEADER.pack(*layout, 1), 0)
+        self._map = mmap.mmap(self._fd, size)
+        self._vectors = np.ndarray(
+            (slots, dim), dtype=np.float32, buffer=self._map, offset=self.HEADER_SIZE
+        )
+        self._entries = np.ndarray(
+            slots,
+            dtype=self.ENTRY,
+            buffer=self._map,
+            offset=self.HEADER_SIZE + vectors_size,
+        )
+        self._answers_offset = self.HEADER_SIZE + vectors_size + entries_size
+
+    @contextlib.contextmanager
+    def _locked(self) -> Iterator[None]:
+        fcntl.flock(cast(int, self._fd), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(cast(int, self._fd), fcntl.LOCK_UN)
+
+    def _answer_offset(self, slot: int) -> int:
+        return self._answers_offset + slot * (
+            self.ANSWER_LENGTH.size + self._answer_bytes
+        )
+
+    async def lookup(self, question: str) -> dict | None:
+        """Classify ``question`` and find a cached answer for it.
+
+        Returns None when the question is not cacheable, otherwise a dict with
+        its ``intent`` and ``vector``, plus the ``answer`` and entry ``id`` on a hit.
+        """
+        if self._intent_vectors is None:
+            self.prime()
+            if self._priming is not None:
+                # the caller's timeout must not cancel the shared embedding call
+                await asyncio.shield(self._priming)
+        intent_vectors = self._intent_vectors
+        if (
+            intent_vectors is None
+            or len(intent_vectors) == 0
+            or not question
+            or len(question) > self._config.max_question_chars
+        ):
+            return None
+        vector = (await self.embed([question]))[0]
+        intent_scores = intent_vectors @ vector
+        best = int(np.argmax(intent_scores))
+        if intent_scores[best] < self._config.intent_threshold:
+            return None
+        intent = self._intent_names[best]
+        result: dict = {"intent": intent, "vector": vector}
+        if self._map is None:
+            return result
+
+        vectors = cast(np.ndarray, self._vectors)
+        entries = cast(np.ndarray, self._entries)
+        now = time.time()
+        intent_index = self._intent_names.index(intent)
+        with self._locked():
+            scores = vectors @ vector
+            valid = (entries["intent"] == intent_index) & (entries["expires"] > now)
+            scores[~valid] = -1.0
+            slot = int(np.argmax(scores))
+            if scores[slot] >= self._config.threshold:
+                entries["last_used"][slot] = now
+                offset = self._answer_offset(slot)
+                (length,) = self.ANSWER_LENGTH.unpack_from(self._map, offset)
+                start = offset + self.ANSWER_LENGTH.size
+                result.update(
+                    answer=self._map[start : start + length].decode(),
+                    id=int(entries["id"][slot]),
+                    similarity=float(scores[slot]),
+                )
+        return result
+
+    def store(self, intent: str, vector: np.ndarray, answer: str) -> None:
+        if self._map is None or len(answer) > self._config.max_answer_chars:
+            return
+        vectors = cast(np.ndarray, self._vectors)
+        entries = cast(np.ndarray, self._entries)
+        encoded = answer.encode()
+        now = time.time()
+        with self._locked():
+            *layout, next_id = self.HEADER.unpack_from(self._map, 0)
+            free = np.flatnonzero(entries["expires"] <= now)
+            slot = int(free[0]) if len(free) else int(np.argmin(entries["last_used"]))
+            vectors[slot] = vector
+            entries[slot] = (
+                next_id,
+                self._intent_names.index(intent),
+                now + self._config.ttl,
+                now,
+            )
+            offset = self._answer_offset(slot)
+            self.ANSWER_LENGTH.pack_into(self._map, offset, len(encoded))
+            start = offset + self.ANSWER_LENGTH.size
+            self._map[start : start + len(encoded)] = encoded
+            self.HEADER.pack_into(self._map, 0, *layout, next_id + 1)
+
+    def evict(self, entry_id: int) -> None:
+        if self._map is None:
+            return
+        entries = cast(np.ndarray, self._entries)
+        with self._locked():
+            entries["expires"][entries["id"] == entry_id] = 0.0
+
+    def should_audit(self) -> bool:
+        return random.random() < self._config.audit_rate
+
+    async def audit(self, entry_id: int, cached: str, fresh: str) -> bool:
+        """Compare a cached answer with a fresh one, evicting the entry if they differ."""
+        vectors = await self.embed([cached, fresh])
+        agrees = float(vectors[0] @ vectors[1]) >= self._config.audit_threshold
+        if not agrees:
+            self.evict(entry_id)
+        return agrees
+
+
+# --- Session Analytics ---
+ANALYTICS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS turns (
+    session_id TEXT NOT NULL,
+    turn_id INTEGER NOT NULL,
+    day TEXT NOT NULL,
+    started_at REAL NOT NULL,
+    room TEXT,
+    agent_type TEXT,
+    model TEXT,
+    stt_provider TEXT,
+    tts_provider TEXT,
+    prompt_tokens INTEGER,
+    completion_tokens INTEGER,
+    stt_seconds REAL,
+    tts_chars INTEGER,
+    eou_ms REAL,
+    llm_ttft_ms REAL,
+    tts_ttfb_ms REAL,
+    total_ms REAL,
+    cost REAL,
+    PRIMARY KEY (session_id, turn_id)
+);
+CREATE INDEX IF NOT EXISTS turns_day_model_latency ON turns (day, model, total_ms);
+CREATE TABLE IF NOT EXISTS sessions (
+    session_id TEXT PRIMARY KEY,
+    day TEXT NOT NULL,
+    started_at REAL NOT NULL,
+    ended_at REAL NOT NULL,
+    room TEXT,
+    agent_type TEXT,
+    model TEXT,
+    fast_model TEXT,
+    stt_provider TEXT,
+    tts_provider TEXT,
+    turns INTEGER,
+    prompt_tokens INTEGER,
+    completion_tokens INTEGER,
+    stt_seconds REAL,
+    tts_chars INTEGER,
+    llm_cost REAL,
+    stt_cost REAL,
+    tts_cost REAL,
+    cost REAL,
+    latency_p50_ms REAL,
+    latency_max_ms REAL
+);
+CREATE INDEX IF NOT EXISTS sessions_day_model ON sessions (day, model, cost);
+"""
+
+
+class AnalyticsStore:
+    """Buffers per-turn and per-session rows and writes them to SQLite on a background thread.
+
+    Rows are written in batched transactions of up to ``batch_size`` rows, at
+    least every ``flush_interval`` seconds. The database runs in WAL mode so all
+    worker processes can append while the query CLI reads.
+    """
+
+    _instance: "AnalyticsStore | None" = None
+
+    def __init__(self, config: AnalyticsConfig):
+        os.makedirs(os.path.dirname(config.path) or ".", exist_ok=True)
+        self._config = config
+        self._pid = os.getpid()
+        self._queue: queue.SimpleQueue[tuple[str, dict] | None] = queue.SimpleQueue()
+        self._thread = threading.Thread(
+            target=self._run, name="analytics-writer", daemon=True
+        )
+        self._thread.start()
+        atexit.register(self.close)
+
+    @classmethod
+    def get(cls, config: AnalyticsConfig) -> "AnalyticsStore":
+        if cls._instance is None or cls._instance._pid != os.getpid():
+            cls._instance = cls(config)
+        return cls._instance
+
+    def add_turn(self, row: dict) -> None:
+        self._queue.put(("turns", row))
+
+    def add_session(self, row: dict) -> None:
+        self._queue.put(("sessions", row))
+
+    def _run(self) -> None:
+        conn = sqlite3.connect(self._config.path, timeout=30.0)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(ANALYTICS_SCHEMA)
+        closing = False
+        while not closing:
+            batch: list[tuple[str, dict]] = []
+            deadline = time.monotonic() + self._config.flush_interval
+            while len(batch) < self._config.batch_size:
+                try:
+                    item = self._queue.get(
+                        timeout=max(0.0, deadline - time.monotonic())
+                    )
+                except queue.Empty:
+                    break
+                if item is None:
+                    closing = True
+                    break
+                batch.append(item)
+            if batch:
+                self._write(conn, batch)
+        conn.close()
+
+    @staticmethod
+    def _write(conn: sqlite3.Connection, batch: list[tuple[str, dict]]) -> None:
+        tables: dict[tuple[str, tuple[str, ...]], list[tuple]] = defaultdict(list)
+        for table, row in batch:
+            tables[(table, tuple(row))].append(tuple(row.values()))
+        try:
+            with conn:
+                for (table, columns), rows in tables.items():
+                    conn.executemany(
+                        f"INSERT OR REPLACE INTO {table} ({', '.join(columns)}) "
+                        f"VALUES ({', '.join('?' * len(columns))})",
+                        rows,
+                    )
+        except sqlite3.Error as e:
+            logger.warning(f"Dropped {len(batch)} analytics rows: {e}")
+
+    def close(self) -> None:
+        if not self._thread.is_alive():
+            return
+        self._queue.put(None)
+        self._thread.join(timeout=5.0)
+
+
 # --- Metrics Management ---
+class _DroppedChild:
+    """Stands in for a metric child that the cardinality guard refused to create."""
+
+    def inc(self, amount: float = 1) -> None:
+        pass
+
+    def dec(self, amount: float = 1) -> None:
+        pass
+
+    def set(self, value: float) -> None:
+        pass
+
+
+class MetricsPusher:
+    """Batches metric updates in memory and pushes them to agent-metrics.
+
+    Updates are coalesced per series (last value for ``set``, summed deltas for
+    ``inc``) and flushed every ``push_interval`` seconds as JSON datagrams over a
+    Unix socket. A flush is sent even when idle, as the heartbeat agent-metrics
+    uses to tell live processes from dead ones, and an exit message on shutdown
+    retires this process' live gauges immediately.
+    """
+
+    MAX_DATAGRAM_UPDATES = 500
+    _instance: "MetricsPusher | None" = None
+
+    def __init__(self, config: MetricsConfig):
+        self._path = config.push_socket
+        self._proc = f"{socket.gethostname()}:{os.getpid()}"
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+        self._meta: dict[str, list] = {}
+        self._updates: dict[tuple, list] = {}
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self._sock.setblocking(False)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, args=(config.push_interval,), daemon=True
+        )
+        self._thread.start()
+        atexit.register(self.close)
+
+    @classmethod
+    def get(cls, config: MetricsConfig) -> "MetricsPusher":
+        # job processes may be forked from the worker, so keep one instance per pid
+        if cls._instance is None or cls._instance._pid != os.getpid():
+            cls._instance = cls(config)
+        return cls._instance
+
+    def record(
+        self, metric: Counter | Gauge, labels: dict[str, str], op: str, value: float
+    ) -> None:
+        name = metric._name  # type: ignore[reportPrivateUsage]
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            if name not in self._meta:
+                self._meta[name] = [
+                    metric._type,  # type: ignore[reportPrivateUsage]
+                    getattr(metric, "_multiprocess_mode", "all"),
+                    metric._documentation,  # type: ignore[reportPrivateUsage]
+                ]
+            entry = self._updates.get(key)
+            if op == "set" or entry is None:
+                self._updates[key] = [op, value]
+            else:
+                entry[1] += value
+
+    def _run(self, interval: float) -> None:
+        while not self._stop.wait(interval):
+            self.flush()
+
+    def flush(self, exiting: bool = False) -> None:
+        with self._lock:
+            updates, self._updates = self._updates, {}
+            meta = dict(self._meta)
+        items = list(updates.items())
+        batches = [
+            items[i : i + self.MAX_DATAGRAM_UPDATES]
+            for i in range(0, len(items), self.MAX_DATAGRAM_UPDATES)
+        ] or [[]]
+        for i, batch in enumerate(batches):
+            message = {
+                "proc": self._proc,
+                "meta": {name: meta[name] for (name, _), _ in batch},
+                "updates": [
+                    [name, dict(labels), op, value]
+                    for (name, labels), (op, value) in batch
+                ],
+                "exit": exiting and i == len(batches) - 1,
+            }
+            try:
+                self._sock.sendto(json.dumps(message).encode(), self._path)
+            except OSError as e:
+                # agent-metrics is down or backlogged: keep the updates for next time
+                logger.debug(f"Metrics push to {self._path} failed: {e}")
+                self._requeue(batches[i:])
+                return
+
+    def _requeue(self, batches: list[list]) -> None:
+        with self._lock:
+            for batch in batches:
+                for key, (op, value) in batch:
+                    newer = self._updates.get(key)
+                    if newer is None:
+                        self._updates[key] = [op, value]
+                    elif newer[0] == "inc":
+                        self._updates[key] = [op, value + newer[1]]
+
+    def close(self) -> None:
+        if self._stop.is_set():
+            return
+        self._stop.set()
+        self._thread.join(timeout=1.0)
+        self.flush(exiting=True)
+
+
+class _PushChild:
+    def __init__(self, pusher: MetricsPusher, metric: Counter | Gauge, labels: dict):
+        self._pusher = pusher
+        self._metric = metric
+        self._labels = labels
+
+    def inc(self, amount: float = 1) -> None:
+        self._pusher.record(self._metric, self._labels, "inc", amount)
+
+    def dec(self, amount: float = 1) -> None:
+        self._pusher.record(self._metric, self._labels, "inc", -amount)
+
+    def set(self, value: float) -> None:
+        self._pusher.record(self._metric, self._labels, "set", value)
+
+
+class LabelRegistry:
+    """Label sets admitted by any process sharing the metrics directory.
+
+    Every job runs in its own short-lived process, so per-process bookkeeping
+    would only ever see one job's label sets. Admitted label sets are appended
+    to a file shared by all processes, under an exclusive lock, and the file is
+    cleared with the series by ``reset_multiproc_dir``. Each process caches the
+    answers it got, since an admitted label set stays admitted and a full metric
+    stays full.
+    """
+
+    _instance: "LabelRegistry | None" = None
+
+    FILENAME = "label_sets.jsonl"
+
+    def __init__(self, path: str):
+        self._pid = os.getpid()
+        self._path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT | os.O_APPEND, 0o666)
+        self._admitted: set[tuple[str, str]] = set()
+        self._refused: set[tuple[str, str]] = set()
+
+    @classmethod
+    def get(cls, path: str) -> "LabelRegistry":
+        instance = cls._instance
+        if instance is None or instance._pid != os.getpid() or instance._path != path:
+            cls._instance = instance = cls(path)
+        return instance
+
+    def admit(self, name: str, key: str, limit: int) -> bool:
+        """Admit ``key`` for ``name`` unless ``limit`` keys were already admitted."""
+        entry = (name, key)
+        if entry in self._admitted:
+            return True
+        if entry in self._refused:
+            return False
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        try:
+            data = os.pread(self._fd, os.fstat(self._fd).st_size, 0)
+            count = 0
+            for line in data.decode().splitlines():
+                known = tuple(json.loads(line))
+                if known[0] == name:
+                    count += 1
+                    self._admitted.add(known)  # pyright: ignore[reportArgumentType]
+            if entry in self._admitted:
+                return True
+            if count >= limit:
+                self._refused.add(entry)
+                return False
+            os.write(self._fd, (json.dumps(entry) + "\n").encode())
+            self._admitted.add(entry)
+            return True
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+
+def reset_multiproc_dir(path: str) -> None:
+    """Remove the series and admitted label sets left by earlier worker runs.
+
+    prometheus_client expects the multiprocess directory to be wiped before the
+    worker starts, and the label sets must go with the series they admitted.
+    """
+    for name in os.listdir(path):
+        if name.endswith(".db") or name == LabelRegistry.FILENAME:
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(os.path.join(path, name))
+
+
 class MetricsManager:
-    def __init__(self, config: AppConfig):
+    def __init__(self, config: AppConfig, tracer: SessionTracer | None = None):
         self._config = config
+        self._tracer = tracer
+        self._filler_speech_ids: set[str] = set()
+        self._filler_gate = FillerGate(config.filler_gate)
+        self._room = "unknown"
+        self._label_registry = LabelRegistry.get(
+            os.path.join(config.prometheus_multiproc_dir, LabelRegistry.FILENAME)
+        )
+        self._turn_latencies_ms: list[int] = []
+        self._completion_tokens: dict[str, deque[int]] = defaultdict(
+            lambda: deque(maxlen=50)
+        )
+        self._llm_ttfts: deque[float] = deque(maxlen=50)
+        self._session_id = secrets.token_hex(8)
+        self._session_started_at = time.time()
+        self._analytics = (
+            AnalyticsStore.get(config.analytics) if config.analytics.enabled else None
+        )
+        self._turn_row: dict | None = None
+        self._pusher = (
+            MetricsPusher.get(config.metrics)
+            if config.metrics.transport == "push"
+            else None
+        )
         self._registry = CollectorRegistry()
         multiprocess.MultiProcessCollector(self._registry)
         os.environ["PROMETHEUS_MULTIPROC_DIR"] = config.prometheus_multiproc_dir
@@ -316,6 +1705,150 @@ class MetricsManager:
             ["agent_type"],
             registry=self._registry,
         )
+        self.time_to_first_audio = Gauge(
+            "livekit_time_to_first_audio_ms",
+            "Time from the agent joining the room to its first audio in milliseconds",
+            ["agent_type"],
+            registry=self._registry,
+        )
+
+        # --- Audio Output Metrics ---
+        self.mouth_to_ear_latency = Gauge(
+            "livekit_mouth_to_ear_latency_ms",
+            "End of user speech to the first audible agent audio in milliseconds",
+            ["speech", "agent_type"],
+            registry=self._registry,
+        )
+        self.filler_handoff_gap = Gauge(
+            "livekit_filler_handoff_gap_ms",
+            "Silence between the end of the filler audio and the reply audio in milliseconds",
+            ["agent_type"],
+            registry=self._registry,
+        )
+        self.audio_underruns = Counter(
+            "livekit_audio_underruns_total",
+            "Times the agent audio output ran dry in the middle of a speech",
+            ["speech", "agent_type"],
+            registry=self._registry,
+        )
+        self.audio_underrun_duration = Counter(
+            "livekit_audio_underrun_ms_total",
+            "Silence heard by callers due to audio output underruns in milliseconds",
+            ["speech", "agent_type"],
+            registry=self._registry,
+        )
+
+        # --- Filler Gating Metrics ---
+        self.filler_gate_decisions = Counter(
+            "livekit_filler_gate_decisions_total",
+            "Filler gating decisions",
+            ["decision", "agent_type"],
+            registry=self._registry,
+        )
+        self.filler_gate_outcomes = Counter(
+            "livekit_filler_gate_outcomes_total",
+            "Filler gating decisions scored against the observed answer latency",
+            ["decision", "outcome", "agent_type"],
+            registry=self._registry,
+        )
+        self.filler_gate_predicted_latency = Gauge(
+            "livekit_filler_gate_predicted_latency_ms",
+            "Predicted end-of-turn to answer audio latency in milliseconds",
+            ["agent_type"],
+            registry=self._registry,
+        )
+        self.filler_gate_prediction_error = Gauge(
+            "livekit_filler_gate_prediction_error_ms",
+            "Observed minus predicted answer latency in milliseconds",
+            ["agent_type"],
+            registry=self._registry,
+        )
+
+        # --- Endpointing Metrics ---
+        self.endpointing_delay = Gauge(
+            "livekit_eou_endpointing_delay_ms",
+            "Minimum endpointing delay currently used for the caller in milliseconds",
+            ["agent_type"],
+            registry=self._registry,
+        )
+        self.pause_quantile = Gauge(
+            "livekit_eou_pause_quantile_ms",
+            "Configured quantile of the caller's pauses within a turn in milliseconds",
+            ["agent_type"],
+            registry=self._registry,
+        )
+        self.false_cuts = Counter(
+            "livekit_eou_false_cuts_total",
+            "User turns ended while the user was still speaking",
+            ["agent_type"],
+            registry=self._registry,
+        )
+
+        # --- Turn Budget Metrics ---
+        self.streams_cancelled = Counter(
+            "livekit_turn_streams_cancelled_total",
+            "Provider streams closed because their turn was interrupted or ended",
+            ["stage", "reason", "agent_type"],
+            registry=self._registry,
+        )
+        self.streams_timed_out = Counter(
+            "livekit_turn_streams_timed_out_total",
+            "Provider streams closed because they missed the turn deadline or stalled",
+            ["stage", "reason", "agent_type"],
+            registry=self._registry,
+        )
+        self.llm_tokens_saved = Counter(
+            "livekit_llm_tokens_saved_total",
+            "Estimated completion tokens not generated because a stream was closed early",
+            ["model"],
+            registry=self._registry,
+        )
+        self.filler_fallbacks = Counter(
+            "livekit_filler_fallbacks_total",
+            "Fillers that missed their deadline, by fallback",
+            ["fallback", "agent_type"],
+            registry=self._registry,
+        )
+
+        # --- Semantic Cache Metrics ---
+        self.cache_lookups = Counter(
+            "livekit_semantic_cache_lookups_total",
+            "Semantic cache lookups by result",
+            ["result", "intent", "agent_type"],
+            registry=self._registry,
+        )
+        self.cache_audits = Counter(
+            "livekit_semantic_cache_audits_total",
+            "Audited cache hits by result",
+            ["result", "intent", "agent_type"],
+            registry=self._registry,
+        )
+        self.cache_lookup_latency = Gauge(
+            "livekit_semantic_cache_lookup_ms",
+            "Semantic cache lookup latency in milliseconds",
+            ["agent_type"],
+            registry=self._registry,
+        )
+        self.cache_latency_saved = Gauge(
+            "livekit_semantic_cache_latency_saved_ms",
+            "Primary LLM TTFT avoided by the last cache hit, net of the lookup",
+            ["agent_type"],
+            registry=self._registry,
+        )
+
+        # --- Rate Limiting Metrics ---
+        self.rate_limit_wait = Gauge(
+            "livekit_llm_rate_limit_wait_ms",
+            "Time the last LLM request waited for its rate limit bucket in milliseconds",
+            ["priority", "model", "agent_type"],
+            registry=self._registry,
+        )
+        self.rate_limited = Counter(
+            "livekit_llm_rate_limited_total",
+            "LLM requests held back by the rate limiter, by outcome",
+            ["priority", "outcome", "model", "agent_type"],
+            registry=self._registry,
+        )
 
         # --- Usage & Concurrency Metrics ---
         self.llm_tokens = Counter(
@@ -378,43 +1911,88 @@ class MetricsManager:
             registry=self._registry,
         )
 
+        self.dropped_label_sets = Counter(
+            "livekit_metrics_dropped_label_sets_total",
+            "Metric updates dropped because the metric reached its label set limit",
+            ["metric"],
+            registry=self._registry,
+        )
+
         for metric in [
+            self.dropped_label_sets,
             self.llm_tokens,
             self.stt_duration,
             self.tts_chars,
             self.conversation_turns,
             self.total_tokens,
+            self.filler_gate_decisions,
+            self.filler_gate_outcomes,
+            self.streams_cancelled,
+            self.streams_timed_out,
+            self.llm_tokens_saved,
+            self.filler_fallbacks,
+            self.cache_lookups,
+            self.cache_audits,
+            self.rate_limited,
+            self.false_cuts,
+            self.audio_underruns,
+            self.audio_underrun_duration,
         ]:
             metric._multiprocess_mode = "livesum"  # type: ignore[reportPrivateUsage]
 
+    def labels(self, metric: Counter | Gauge, **labels: str):
+        """Return the child for ``labels``, refusing new label sets past the configured limit."""
+        name = metric._name  # type: ignore[reportPrivateUsage]
+        key = json.dumps(sorted(labels.items()))
+        if not self._label_registry.admit(
+            name, key, self._config.metrics.max_label_sets
+        ):
+            self._child(self.dropped_label_sets, {"metric": name}).inc()
+            return _DroppedChild()
+        return self._child(metric, labels)
+
+    def _child(self, metric: Counter | Gauge, labels: dict[str, str]):
+        if self._pusher is not None:
+            return _PushChild(self._pusher, metric, labels)
+        return metric.labels(**labels) if labels else metric
+
+    def set_room(self, room: str) -> None:
+        self._room = room
+
+    def _room_label(self, room: str) -> str:
+        return room if self._config.metrics.room_label == "full" else "all"
+
     def initialize_metrics(self) -> None:
         """Initialize metrics with default labels to ensure they exist."""
         logger.debug("Initializing metrics with default values...")
         cfg = self._config
-        self.llm_latency.labels(
-            model=cfg.primary_llm.model, agent_type=cfg.agent_type
+        self.labels(
+            self.llm_latency, model=cfg.primary_llm.model, agent_type=cfg.agent_type
         ).set(0)
-        self.llm_latency_small.labels(
-            model=cfg.fast_llm.model, agent_type=cfg.agent_type
+        self.labels(
+            self.llm_latency_small, model=cfg.fast_llm.model, agent_type=cfg.agent_type
         ).set(0)
-        self.stt_latency.labels(
-            provider=cfg.stt.provider, agent_type=cfg.agent_type
+        self.labels(
+            self.stt_latency, provider=cfg.stt.provider, agent_type=cfg.agent_type
         ).set(0)
-        self.tts_latency.labels(
-            provider=cfg.tts.provider, agent_type=cfg.agent_type
+        self.labels(
+            self.tts_latency, provider=cfg.tts.provider, agent_type=cfg.agent_type
         ).set(0)
-        self.eou_latency.labels(agent_type=cfg.agent_type).set(0)
-        self.total_conversation_latency.labels(agent_type=cfg.agent_type).set(0)
-
-        self.llm_tokens.labels(type="prompt", model=cfg.primary_llm.model).inc(0)
-        self.llm_tokens.labels(type="completion", model=cfg.primary_llm.model).inc(0)
-        self.stt_duration.labels(provider=cfg.stt.provider).inc(0)
-        self.tts_chars.labels(provider=cfg.tts.provider).inc(0)
-        self.total_tokens.inc(0)
-
-        self.llm_cost.labels(model=cfg.primary_llm.model).set(0)
-        self.stt_cost.labels(provider=cfg.stt.provider).set(0)
-        self.tts_cost.labels(provider=cfg.tts.provider).set(0)
+        self.labels(self.eou_latency, agent_type=cfg.agent_type).set(0)
+        self.labels(self.total_conversation_latency, agent_type=cfg.agent_type).set(0)
+        self.labels(self.time_to_first_audio, agent_type=cfg.agent_type).set(0)
+
+        self.labels(self.llm_tokens, type="prompt", model=cfg.primary_llm.model).inc(0)
+        self.labels(
+            self.llm_tokens, type="completion", model=cfg.primary_llm.model
+        ).inc(0)
+        self.labels(self.stt_duration, provider=cfg.stt.provider).inc(0)
+        self.labels(self.tts_chars, provider=cfg.tts.provider).inc(0)
+        self.labels(self.total_tokens).inc(0)
+
+        self.labels(self.llm_cost, model=cfg.primary_llm.model).set(0)
+        self.labels(self.stt_cost, provider=cfg.stt.provider).set(0)
+        self.labels(self.tts_cost, provider=cfg.tts.provider).set(0)
         logger.debug("Successfully initialized all metrics.")
 
     def handle_event(self, ev: MetricsCollectedEvent) -> None:
@@ -422,19 +2000,371 @@ class MetricsManager:
         metrics.log_metrics(ev.metrics)
         self._update_usage_and_cost(ev.metrics)
         self._update_latency(ev)
+        if isinstance(ev.metrics, LLMMetrics) and not ev.metrics.cancelled:
+            self.observe_completion(
+                self._config.primary_llm.model, ev.metrics.completion_tokens
+            )
+            self._llm_ttfts.append(ev.metrics.ttft)
+        if self._config.filler_gate.enabled:
+            self._update_filler_gate(ev.metrics)
+        if self._tracer is not None:
+            self._update_trace(ev.metrics)
+        if self._analytics is not None:
+            self._update_turn_row(ev.metrics)
+
+    def should_emit_filler(self, context_tokens: int, utterance_tokens: int) -> bool:
+        """Ask the filler gate whether this turn's answer is slow enough to need a filler."""
+        if not self._config.filler_gate.enabled:
+            return True
+        emit, predicted_ms = self._filler_gate.decide(context_tokens, utterance_tokens)
+        agent_type = self._config.agent_type
+        self.labels(
+            self.filler_gate_decisions,
+            decision="emit" if emit else "skip",
+            agent_type=agent_type,
+        ).inc()
+        if predicted_ms is not None:
+            self.labels(self.filler_gate_predicted_latency, agent_type=agent_type).set(
+                predicted_ms
+            )
+        logger.info(
+            "Filler gate decision",
+            extra={
+                "emit": emit,
+                "predicted_ms": predicted_ms,
+                "context_tokens": context_tokens,
+                "utterance_tokens": utterance_tokens,
+                "turn_id": self._turn_id_counter,
+            },
+        )
+        return emit
+
+    def _update_filler_gate(self, m: AgentMetrics) -> None:
+        result = None
+        # cancelled streams are dropped preemptive generations, not the answer
+        if isinstance(m, LLMMetrics) and not m.cancelled:
+            result = self._filler_gate.observe_llm(m.ttft)
+        elif (
+            isinstance(m, TTSMetrics)
+            and not m.cancelled
+            and m.speech_id not in self._filler_speech_ids
+        ):
+            result = self._filler_gate.observe_tts(m.ttfb)
+        if result is None:
+            return
+
+        agent_type = self._config.agent_type
+        self.labels(
+            self.filler_gate_outcomes,
+            decision=result["decision"],
+            outcome=result["outcome"],
+            agent_type=agent_type,
+        ).inc()
+        if result["predicted_ms"] is not None:
+            self.labels(self.filler_gate_prediction_error, agent_type=agent_type).set(
+                result["actual_ms"] - result["predicted_ms"]
+            )
+        logger.info("Filler gate outcome", extra=result)
+
+    def observe_completion(self, model: str, completion_tokens: int) -> None:
+        """Remember how long completed answers of ``model`` are, to estimate tokens saved."""
+        self._completion_tokens[model].append(completion_tokens)
+
+    def record_endpointing(self, delay: float, pause_quantile: float | None) -> None:
+        agent_type = self._config.agent_type
+        self.labels(self.endpointing_delay, agent_type=agent_type).set(delay * 1000)
+        if pause_quantile is not None:
+            self.labels(self.pause_quantile, agent_type=agent_type).set(
+                pause_quantile * 1000
+            )
+        logger.info(
+            "Endpointing delay updated",
+            extra={
+                "min_endpointing_delay_ms": round(delay * 1000, 2),
+                "pause_quantile_ms": round(pause_quantile * 1000, 2)
+                if pause_quantile is not None
+                else None,
+                "turn_id": self._turn_id_counter,
+            },
+        )
+
+    def record_false_cut(self, pause: float) -> None:
+        self.labels(self.false_cuts, agent_type=self._config.agent_type).inc()
+        logger.info(
+            "False end of turn",
+            extra={
+                "pause_ms": round(pause * 1000, 2),
+                "turn_id": self._turn_id_counter,
+            },
+        )
+
+    def expected_completion_tokens(self, model: str) -> int:
+        samples = self._completion_tokens[model]
+        return int(statistics.median(samples)) if samples else 0
+
+    def record_rate_limit(
+        self, priority: str, model: str, waited: float | None
+    ) -> None:
+        """Record how long a request waited for the rate limiter, None if it gave up."""
+        agent_type = self._config.agent_type
+        if waited is None:
+            outcome = "overdraft" if priority == "primary" else "skipped"
+        elif waited > 0:
+            outcome = "delayed"
+        else:
+            return
+        self.labels(
+            self.rate_limited,
+            priority=priority,
+            outcome=outcome,
+            model=model,
+            agent_type=agent_type,
+        ).inc()
+        if waited is not None:
+            self.labels(
+                self.rate_limit_wait,
+                priority=priority,
+                model=model,
+                agent_type=agent_type,
+            ).set(waited * 1000)
+        logger.info(
+            "LLM request rate limited",
+            extra={
+                "priority": priority,
+                "model": model,
+                "outcome": outcome,
+                "waited_ms": round(waited * 1000, 2) if waited is not None else None,
+                "turn_id": self._turn_id_counter,
+            },
+        )
+
+    def record_stream_stop(
+        self,
+        stage: str,
+        reason: str,
+        model: str | None = None,
+        completion_tokens: int = 0,
+    ) -> None:
+        """Count a stream closed early and estimate the completion tokens it saved."""
+        agent_type = self._config.agent_type
+        timed_out = reason in ("deadline", "stall")
+        self.labels(
+            self.streams_timed_out if timed_out else self.streams_cancelled,
+            stage=stage,
+            reason=reason,
+            agent_type=agent_type,
+        ).inc()
+        tokens_saved = 0
+        if model is not None and self._completion_tokens[model]:
+            expected = self.expected_completion_tokens(model)
+            tokens_saved = max(0, expected - completion_tokens)
+            self.labels(self.llm_tokens_saved, model=model).inc(tokens_saved)
+        logger.info(
+            "Turn stream stopped",
+            extra={
+                "stage": stage,
+                "reason": reason,
+                "completion_tokens": completion_tokens,
+                "tokens_saved": tokens_saved,
+                "turn_id": self._turn_id_counter,
+            },
+        )
+
+    def record_filler_fallback(self, fallback: str) -> None:
+        self.labels(
+            self.filler_fallbacks,
+            fallback=fallback,
+            agent_type=self._config.agent_type,
+        ).inc()
+
+    def record_cache_lookup(self, result: str, intent: str, lookup_ms: float) -> None:
+        agent_type = self._config.agent_type
+        self.labels(
+            self.cache_lookups, result=result, intent=intent, agent_type=agent_type
+        ).inc()
+        self.labels(self.cache_lookup_latency, agent_type=agent_type).set(lookup_ms)
+        saved_ms = None
+        if result == "hit" and self._llm_ttfts:
+            saved_ms = statistics.median(self._llm_ttfts) * 1000 - lookup_ms
+            self.labels(self.cache_latency_saved, agent_type=agent_type).set(saved_ms)
+        logger.info(
+            "Semantic cache lookup",
+            extra={
+                "result": result,
+                "intent": intent,
+                "lookup_ms": round(lookup_ms, 2),
+                "latency_saved_ms": saved_ms,
+                "turn_id": self._turn_id_counter,
+            },
+        )
+
+    def record_cache_audit(self, intent: str, agrees: bool) -> None:
+        self.labels(
+            self.cache_audits,
+            result="agree" if agrees else "false_hit",
+            intent=intent,
+            agent_type=self._config.agent_type,
+        ).inc()
+
+    def mark_filler_speech(self, speech_id: str) -> None:
+        """Flag a speech as a filler so its TTS metrics are not attributed to the answer."""
+        self._filler_speech_ids.add(speech_id)
+
+    def is_filler_speech(self, speech_id: str) -> bool:
+        return speech_id in self._filler_speech_ids
+
+    def record_mouth_to_ear(
+        self, speech: str, speech_end: float, heard_at: float
+    ) -> None:
+        latency_ms = (heard_at - speech_end) * 1000
+        self.labels(
+            self.mouth_to_ear_latency, speech=speech, agent_type=self._config.agent_type
+        ).set(latency_ms)
+        if self._tracer is not None:
+            self._tracer.record("mouth_to_ear", speech_end, heard_at, speech=speech)
+        logger.info(
+            "Mouth-to-ear latency",
+            extra={
+                "speech": speech,
+                "mouth_to_ear_ms": round(latency_ms, 2),
+                "turn_id": self._turn_id_counter,
+            },
+        )
 
-    def _start_new_turn(self, room: str) -> None:
+    def record_filler_handoff(self, gap: float) -> None:
+        self.labels(self.filler_handoff_gap, agent_type=self._config.agent_type).set(
+            gap * 1000
+        )
+        logger.info(
+            "Filler to reply handoff",
+            extra={"gap_ms": round(gap * 1000, 2), "turn_id": self._turn_id_counter},
+        )
+
+    def record_audio_underrun(self, speech: str, gap: float) -> None:
+        agent_type = self._config.agent_type
+        self.labels(self.audio_underruns, speech=speech, agent_type=agent_type).inc()
+        self.labels(
+            self.audio_underrun_duration, speech=speech, agent_type=agent_type
+        ).inc(gap * 1000)
+        logger.debug(
+            "Audio output underrun",
+            extra={
+                "speech": speech,
+                "gap_ms": round(gap * 1000, 2),
+                "turn_id": self._turn_id_counter,
+            },
+        )
+
+    def _update_trace(self, m: AgentMetrics) -> None:
+        tracer = cast(SessionTracer, self._tracer)
+        if isinstance(m, EOUMetrics):
+            speech_end = m.last_speaking_time or m.timestamp - m.end_of_utterance_delay
+            tracer.record("stt.final", speech_end, speech_end + m.transcription_delay)
+            tracer.record(
+                "eou",
+                speech_end,
+                speech_end + m.end_of_utterance_delay,
+                speech_id=m.speech_id,
+            )
+        elif isinstance(m, LLMMetrics):
+            tracer.record(
+                "primary.llm",
+                m.timestamp - m.duration,
+                m.timestamp,
+                speech_id=m.speech_id,
+                model=self._config.primary_llm.model,
+                ttft_ms=m.ttft * 1000,
+                prompt_tokens=m.prompt_tokens,
+                completion_tokens=m.completion_tokens,
+                cancelled=m.cancelled,
+            )
+        elif isinstance(m, TTSMetrics):
+            is_filler = m.speech_id in self._filler_speech_ids
+            tracer.record(
+                "filler.tts" if is_filler else "primary.tts",
+                m.timestamp - m.duration,
+                m.timestamp,
+                speech_id=m.speech_id,
+                provider=self._config.tts.provider,
+                ttfb_ms=m.ttfb * 1000,
+                characters=m.characters_count,
+                cancelled=m.cancelled,
+            )
+
+    def _update_turn_row(self, m: AgentMetrics) -> None:
+        row = self._turn_row
+        if row is None:
+            return
+        if isinstance(m, EOUMetrics):
+            row["eou_ms"] = m.end_of_utterance_delay * 1000
+        elif isinstance(m, LLMMetrics):
+            row["prompt_tokens"] += m.prompt_tokens
+            row["completion_tokens"] += m.completion_tokens
+            # a cancelled preemptive generation still used tokens, but not the answer
+            if row["llm_ttft_ms"] is None and not m.cancelled:
+                row["llm_ttft_ms"] = m.ttft * 1000
+        elif isinstance(m, STTMetrics):
+            row["stt_seconds"] += m.audio_duration
+        elif isinstance(m, TTSMetrics):
+            row["tts_chars"] += m.characters_count
+            if (
+                row["tts_ttfb_ms"] is None
+                and not m.cancelled
+                and m.speech_id not in self._filler_speech_ids
+            ):
+                row["tts_ttfb_ms"] = m.ttfb * 1000
+
+    def _finish_turn_row(self) -> None:
+        """Hand the current turn's row to the analytics store."""
+        row, self._turn_row = self._turn_row, None
+        if row is None or self._analytics is None:
+            return
+        cfg = self._config
+        stages = (row["eou_ms"], row["llm_ttft_ms"], row["tts_ttfb_ms"])
+        row["total_ms"] = sum(stages) if None not in stages else None
+        row["cost"] = (
+            row["prompt_tokens"] * cfg.primary_llm.cost_per_input_token
+            + row["completion_tokens"] * cfg.primary_llm.cost_per_output_token
+            + row["stt_seconds"] * cfg.stt.cost_per_second
+            + row["tts_chars"] * cfg.tts.cost_per_character
+        )
+        self._analytics.add_turn(row)
+
+    def _start_new_turn(self) -> None:
+        self._finish_turn_row()
         self._turn_id_counter += 1
+        if self._analytics is not None:
+            started_at = time.time()
+            self._turn_row = {
+                "session_id": self._session_id,
+                "turn_id": self._turn_id_counter,
+                "day": datetime.utcfromtimestamp(started_at).strftime("%Y-%m-%d"),
+                "started_at": started_at,
+                "room": self._room,
+                "agent_type": self._config.agent_type,
+                "model": self._config.primary_llm.model,
+                "stt_provider": self._config.stt.provider,
+                "tts_provider": self._config.tts.provider,
+                "prompt_tokens": 0,
+                "completion_tokens": 0,
+                "stt_seconds": 0.0,
+                "tts_chars": 0,
+                "eou_ms": None,
+                "llm_ttft_ms": None,
+                "tts_ttfb_ms": None,
+            }
         self._current_turn_metrics = {
             "eou_delay": None,
             "llm_ttft": None,
             "tts_ttfb": None,
         }
-        self.conversation_turns.labels(
-            agent_type=self._config.agent_type, room=room
+        self.labels(
+            self.conversation_turns,
+            agent_type=self._config.agent_type,
+            room=self._room_label(self._room),
         ).inc()
         logger.debug(
-            f"Started new turn with turn_id={self._turn_id_counter}, room={room}"
+            f"Started new turn with turn_id={self._turn_id_counter}, room={self._room}"
         )
 
     def _calculate_total_latency(self) -> None:
@@ -446,6 +2376,7 @@ class MetricsManager:
             llm_ms = self._current_turn_metrics["llm_ttft"] * 1000  # pyright: ignore[reportOptionalOperand]
             tts_ms = self._current_turn_metrics["tts_ttfb"] * 1000  # pyright: ignore[reportOptionalOperand]
             total_ms = int(eou_ms + llm_ms + tts_ms)
+            self._turn_latencies_ms.append(total_ms)
 
             logger.debug(
                 f"Latency components (ms): EOU={int(eou_ms)}, "
@@ -453,8 +2384,8 @@ class MetricsManager:
                 f"TTS={int(tts_ms)}"
             )
 
-            self.total_conversation_latency.labels(
-                agent_type=self._config.agent_type
+            self.labels(
+                self.total_conversation_latency, agent_type=self._config.agent_type
             ).set(total_ms)
             logger.info(
                 "Updated total conversation latency metric",
@@ -507,22 +2438,24 @@ class MetricsManager:
 
         # Update Prometheus counters with deltas
         if prompt_tokens_delta > 0:
-            self.llm_tokens.labels(
-                type="prompt", model=self._config.primary_llm.model
+            self.labels(
+                self.llm_tokens, type="prompt", model=self._config.primary_llm.model
             ).inc(prompt_tokens_delta)
         if completion_tokens_delta > 0:
-            self.llm_tokens.labels(
-                type="completion", model=self._config.primary_llm.model
+            self.labels(
+                self.llm_tokens, type="completion", model=self._config.primary_llm.model
             ).inc(completion_tokens_delta)
         if prompt_tokens_delta > 0 or completion_tokens_delta > 0:
-            self.total_tokens.inc(prompt_tokens_delta + completion_tokens_delta)
+            self.labels(self.total_tokens).inc(
+                prompt_tokens_delta + completion_tokens_delta
+            )
 
         if stt_duration_delta > 0:
-            self.stt_duration.labels(provider=self._config.stt.provider).inc(
+            self.labels(self.stt_duration, provider=self._config.stt.provider).inc(
                 stt_duration_delta
             )
         if tts_chars_delta > 0:
-            self.tts_chars.labels(provider=self._config.tts.provider).inc(
+            self.labels(self.tts_chars, provider=self._config.tts.provider).inc(
                 tts_chars_delta
             )
 
@@ -553,9 +2486,9 @@ class MetricsManager:
             },
         )
 
-        self.llm_cost.labels(model=self._config.primary_llm.model).set(llm_cost)
-        self.stt_cost.labels(provider=self._config.stt.provider).set(stt_cost)
-        self.tts_cost.labels(provider=self._config.tts.provider).set(tts_cost)
+        self.labels(self.llm_cost, model=self._config.primary_llm.model).set(llm_cost)
+        self.labels(self.stt_cost, provider=self._config.stt.provider).set(stt_cost)
+        self.labels(self.tts_cost, provider=self._config.tts.provider).set(tts_cost)
 
         logger.info(
             "Updated cost metrics",
@@ -577,10 +2510,10 @@ class MetricsManager:
 
         if isinstance(m, EOUMetrics):
             logger.debug(f"Processing EOU metrics: {m}")
-            self._start_new_turn(room=getattr(ev, "room", "unknown"))
+            self._start_new_turn()
             delay_ms = m.end_of_utterance_delay * 1000
             logger.debug(f"Observed EOU delay: {delay_ms}ms")
-            self.eou_latency.labels(agent_type=cfg.agent_type).set(delay_ms)
+            self.labels(self.eou_latency, agent_type=cfg.agent_type).set(delay_ms)
             self._current_turn_metrics["eou_delay"] = m.end_of_utterance_delay
             self._calculate_total_latency()
             logger.info(
@@ -604,8 +2537,10 @@ class MetricsManager:
                     f"Observed LLM response generation latency: {duration_ms}ms"
                 )
             if hasattr(m, "ttft"):
-                self.llm_latency.labels(
-                    model=cfg.primary_llm.model, agent_type=cfg.agent_type
+                self.labels(
+                    self.llm_latency,
+                    model=cfg.primary_llm.model,
+                    agent_type=cfg.agent_type,
                 ).set(m.ttft * 1000)
                 self._current_turn_metrics["llm_ttft"] = m.ttft
                 self._calculate_total_latency()
@@ -624,8 +2559,10 @@ class MetricsManager:
             if hasattr(m, "duration"):
                 logger.debug(f"Observed TTS latency: {duration_ms}ms")
             if hasattr(m, "ttfb"):
-                self.tts_latency.labels(
-                    provider=cfg.tts.provider, agent_type=cfg.agent_type
+                self.labels(
+                    self.tts_latency,
+                    provider=cfg.tts.provider,
+                    agent_type=cfg.agent_type,
                 ).set(m.ttfb * 1000)
                 self._current_turn_metrics["tts_ttfb"] = m.ttfb
                 self._calculate_total_latency()
@@ -641,8 +2578,10 @@ class MetricsManager:
             logger.debug(f"Processing STT metrics: {m}")
             duration_ms = getattr(m, "duration", 0) * 1000
             if hasattr(m, "duration"):
-                self.stt_latency.labels(
-                    provider=cfg.stt.provider, agent_type=cfg.agent_type
+                self.labels(
+                    self.stt_latency,
+                    provider=cfg.stt.provider,
+                    agent_type=cfg.agent_type,
                 ).set(duration_ms)
                 logger.debug(
                     f"Observed STT latency to generate transcript: {duration_ms}ms"
@@ -667,11 +2606,75 @@ class MetricsManager:
         else:
             logger.debug(f"Received unknown metrics type: {type(m)}")
 
+    def record_time_to_first_audio(self, delay: float) -> None:
+        delay_ms = delay * 1000
+        self.labels(self.time_to_first_audio, agent_type=self._config.agent_type).set(
+            delay_ms
+        )
+        logger.info(
+            "Time to first agent audio",
+            extra={
+                "time_to_first_audio_ms": round(delay_ms, 2),
+                "timestamp": datetime.now().isoformat(),
+            },
+        )
+
+    def record_greeting_tts(self, characters: int, audio_duration: float) -> None:
+        """Count a greeting synthesized in prewarm, which no session reported."""
+        self._update_usage_and_cost(
+            TTSMetrics(
+                label="greeting",
+                request_id="greeting",
+                timestamp=time.time(),
+                ttfb=0.0,
+                duration=0.0,
+                audio_duration=audio_duration,
+                cancelled=False,
+                characters_count=characters,
+                streamed=False,
+            )
+        )
+
     def session_started(self) -> None:
-        self.active_conversations.labels(agent_type=self._config.agent_type).inc()
+        self.labels(self.active_conversations, agent_type=self._config.agent_type).inc()
 
     def decrement_active_conversations(self) -> None:
-        self.active_conversations.labels(agent_type=self._config.agent_type).dec()
+        self.labels(self.active_conversations, agent_type=self._config.agent_type).dec()
+
+    def _session_row(self, summary: metrics.UsageSummary) -> dict:
+        cfg = self._config
+        llm_cost = (
+            summary.llm_prompt_tokens * cfg.primary_llm.cost_per_input_token
+            + summary.llm_completion_tokens * cfg.primary_llm.cost_per_output_token
+        )
+        stt_cost = summary.stt_audio_duration * cfg.stt.cost_per_second
+        tts_cost = summary.tts_characters_count * cfg.tts.cost_per_character
+        latencies = self._turn_latencies_ms
+        return {
+            "session_id": self._session_id,
+            "day": datetime.utcfromtimestamp(self._session_started_at).strftime(
+                "%Y-%m-%d"
+            ),
+            "started_at": self._session_started_at,
+            "ended_at": time.time(),
+            "room": self._room,
+            "agent_type": cfg.agent_type,
+            "model": cfg.primary_llm.model,
+            "fast_model": cfg.fast_llm.model,
+            "stt_provider": cfg.stt.provider,
+            "tts_provider": cfg.tts.provider,
+            "turns": self._turn_id_counter,
+            "prompt_tokens": summary.llm_prompt_tokens,
+            "completion_tokens": summary.llm_completion_tokens,
+            "stt_seconds": summary.stt_audio_duration,
+            "tts_chars": summary.tts_characters_count,
+            "llm_cost": llm_cost,
+            "stt_cost": stt_cost,
+            "tts_cost": tts_cost,
+            "cost": llm_cost + stt_cost + tts_cost,
+            "latency_p50_ms": statistics.median(latencies) if latencies else None,
+            "latency_max_ms": max(latencies) if latencies else None,
+        }
 
     async def log_session_summary(self) -> None:
         summary = self._usage_collector.get_summary()
@@ -680,7 +2683,18 @@ class MetricsManager:
             "llm_completion_tokens": summary.llm_completion_tokens,
             "stt_audio_duration": round(summary.stt_audio_duration, 2),
             "tts_characters_count": summary.tts_characters_count,
+            "room": self._room,
+            "session_id": self._session_id,
+            "turns": self._turn_id_counter,
         }
+        if self._turn_latencies_ms:
+            summary_dict["latency_ms"] = {
+                "p50": int(statistics.median(self._turn_latencies_ms)),
+                "max": max(self._turn_latencies_ms),
+            }
+        if self._analytics is not None:
+            self._finish_turn_row()
+            self._analytics.add_session(self._session_row(summary))
         logger.info(
             "Session Summary",
             extra={
@@ -690,7 +2704,440 @@ class MetricsManager:
         )
 
 
+# --- Adaptive Endpointing ---
+class AdaptiveEndpointing:
+    """Tunes the session's minimum endpointing delay to the caller's own pauses.
+
+    Pauses within a user turn are measured from VAD state changes, and the delay
+    is set to the ``quantile`` of the caller's recent pauses plus a margin, so
+    fast speakers get a shorter silence timeout. When the user speaks again within
+    ``false_cut_window`` of a committed turn, the turn was cut too early: the
+    pause is learned and ``margin_step`` is added to the margin. Every clean turn
+    takes back the share of a step that holds the false-cut rate near
+    ``max_false_cut_rate``.
+
+    The EOU metric is only emitted once ``on_user_turn_completed`` returned, so
+    the commit time is taken from the end of speech plus the endpointing delay,
+    and speech that resumed before the metric arrived is classified against it.
+    """
+
+    def __init__(
+        self, config: EndpointingConfig, vad_silence: float, metrics_mgr: MetricsManager
+    ):
+        self._config = config
+        self._vad_silence = vad_silence
+        self._metrics_mgr = metrics_mgr
+        self._pauses: deque[float] = deque(maxlen=config.window)
+        self._margin = 0.0
+        self._delay = config.min_delay
+        self._speech_end: float | None = None
+        self._committed_at: float | None = None
+        # (resumed at, pause) of speech that resumed before the turn's EOU metric
+        self._unclassified: deque[tuple[float, float]] = deque(maxlen=config.window)
+        self._last_turn_cut = False
+        self._turns = 0
+        self._session: AgentSession | None = None
+
+    def attach(self, session: AgentSession) -> None:
+        self._session = session
+
+        @session.on("user_state_changed")
+        def _on_user_state(ev: UserStateChangedEvent) -> None:
+            if ev.old_state == "speaking" and ev.new_state == "listening":
+                # VAD reports the end of speech after min_silence_duration of silence
+                self._speech_end = ev.created_at - self._vad_silence
+            elif ev.new_state == "speaking" and self._speech_end is not None:
+                self._on_speech_resumed(ev.created_at)
+
+        @session.on("metrics_collected")
+        def _on_metrics(ev: MetricsCollectedEvent) -> None:
+            m = ev.metrics
+            if isinstance(m, EOUMetrics):
+                if m.last_speaking_time > 0:
+                    self._on_turn_committed(
+                        m.last_speaking_time + m.end_of_utterance_delay
+                    )
+                else:
+                    self._on_turn_committed(m.timestamp)
+
+    def _on_speech_resumed(self, now: float) -> None:
+        pause = now - cast(float, self._speech_end)
+        committed_at, self._committed_at = self._committed_at, None
+        self._speech_end = None
+        if committed_at is None:
+            self._unclassified.append((now, pause))
+            return
+        self._classify(now, pause, committed_at)
+        self._retune()
+
+    def _classify(
+        self, resumed_at: float, pause: float, committed_at: float | None
+    ) -> None:
+        """Learn ``pause``, counting a false cut when it ended after ``committed_at``."""
+        if committed_at is not None:
+            if resumed_at - committed_at > self._config.false_cut_window:
+                # the user started their next turn
+                return
+            self._margin += self._config.margin_step
+            self._last_turn_cut = True
+            self._metrics_mgr.record_false_cut(pause)
+        self._pauses.append(pause)
+
+    def _on_turn_committed(self, committed_at: float) -> None:
+        if self._turns and not self._last_turn_cut:
+            rate = self._config.max_false_cut_rate
+            self._margin = max(
+                0.0, self._margin - self._config.margin_step * rate / (1 - rate)
+            )
+        self._turns += 1
+        self._last_turn_cut = False
+        pending: float | None = committed_at
+        for resumed_at, pause in self._unclassified:
+            # only the first speech after the commit can be a false cut
+            if pending is not None and resumed_at >= pending:
+                self._classify(resumed_at, pause, pending)
+                pending = None
+            else:
+                self._classify(resumed_at, pause, None)
+        self._unclassified.clear()
+        self._committed_at = pending
+        self._retune()
+
+    def _retune(self) -> None:
+        cfg = self._config
+        if len(self._pauses) < cfg.min_samples:
+            return
+        ordered = sorted(self._pauses)
+        pause_quantile = ordered[
+            min(len(ordered) - 1, int(cfg.quantile * len(ordered)))
+        ]
+        delay = min(cfg.ceiling, max(cfg.floor, pause_quantile + self._margin))
+        if abs(delay - self._delay) < 0.01:
+            return
+        self._delay = delay
+        cast(AgentSession, self._session).update_options(min_endpointing_delay=delay)
+        self._metrics_mgr.record_endpointing(delay, pause_quantile)
+
+
+def load_turn_detector() -> type:
+    # Imported on demand: importing the plugin registers its inference runner,
+    # which makes the worker start an extra inference process.
+    from livekit.plugins.turn_detector.english import EnglishModel
+
+    return EnglishModel
+
+
+# --- Audio Output Probe ---
+class AudioProbe(io.AudioOutput):
+    """Pass-through audio output that timestamps what the caller actually hears.
+
+    Frames reach the output faster than real time, so the time a frame is heard
+    is modelled with a playout clock: a frame plays once the audio queued before
+    it has played out, or as soon as it arrives when the queue already ran dry.
+    Running dry in the middle of a speech is an underrun, heard as a gap. The
+    first audible frame of each speech is compared with the end of the user's
+    speech (mouth-to-ear latency) and, for a reply, with the last audible frame
+    of the filler before it (handoff gap).
+    """
+
+    def __init__(
+        self,
+        audio_output: io.AudioOutput,
+        config: AudioProbeConfig,
+        vad_silence: float,
+        metrics_mgr: MetricsManager,
+    ):
+        super().__init__(
+            label="AudioProbe",
+            next_in_chain=audio_output,
+            sample_rate=audio_output.sample_rate,
+            capabilities=io.AudioOutputCapabilities(pause=True),
+        )
+        self._config = config
+        self._vad_silence = vad_silence
+        self._metrics_mgr = metrics_mgr
+        self._session: AgentSession | None = None
+        self._speech_end: float | None = None
+        self._play_end = 0.0  # when the audio handed to the output so far is heard
+        self._paused_at: float | None = None
+        self._segment: dict | None = None
+        self._filler_end: float | None = None
+
+    def attach(self, session: AgentSession) -> None:
+        self._session = session
+
+        @session.on("user_state_changed")
+        def _on_user_state(ev: UserStateChangedEvent) -> None:
+            if ev.old_state == "speaking" and ev.new_state == "listening":
+                # VAD reports the end of speech after min_silence_duration of silence
+                self._speech_end = ev.created_at - self._vad_silence
+            elif ev.new_state == "speaking":
+                self._speech_end = None
+
+        session.output.audio = self
+
+    def _start_segment(self) -> dict:
+        speech = cast(AgentSession, self._session).current_speech
+        is_filler = speech is not None and self._metrics_mgr.is_filler_speech(speech.id)
+        segment = {
+            "speech": "filler" if is_filler else "reply",
+            "speech_end": self._speech_end,
+            "filler_end": None if is_filler else self._filler_end,
+            "heard": False,
+            "last_audible": None,
+        }
+        self._filler_end = None
+        return segment
+
+    def _audible(self, frame: rtc.AudioFrame) -> bool:
+        samples = np.frombuffer(frame.data, dtype=np.int16)
+        threshold = self._config.silence_threshold
+        return samples.size > 0 and bool(
+            samples.max() > threshold or samples.min() < -threshold
+        )
+
+    async def capture_frame(self, frame: rtc.AudioFrame) -> None:
+        await super().capture_frame(frame)
+        await cast(io.AudioOutput, self.next_in_chain).capture_frame(frame)
+
+        now = time.time()
+        segment = self._segment
+        if segment is None:
+            segment = self._segment = self._start_segment()
+        elif (
+            self._paused_at is None
+            and now - self._play_end > self._config.underrun_tolerance
+        ):
+            self._metrics_mgr.record_audio_underrun(
+                segment["speech"], now - self._play_end
+            )
+        plays_at = max(now, self._play_end)
+        self._play_end = plays_at + frame.duration
+
+        if not self._audible(frame):
+            return
+        segment["last_audible"] = self._play_end
+        if segment["heard"]:
+            return
+        segment["heard"] = True
+        if segment["speech_end"] is not None:
+            self._metrics_mgr.record_mouth_to_ear(
+                segment["speech"], segment["speech_end"], plays_at
+            )
+        if segment["filler_end"] is not None:
+            self._metrics_mgr.record_filler_handoff(plays_at - segment["filler_end"])
+        if segment["speech"] == "reply":
+            # later speeches answer the same user turn
+            self._speech_end = None
+
+    def flush(self) -> None:
+        super().flush()
+        cast(io.AudioOutput, self.next_in_chain).flush()
+        segment, self._segment = self._segment, None
+        if segment is not None and segment["speech"] == "filler":
+            self._filler_end = segment["last_audible"]
+
+    def clear_buffer(self) -> None:
+        cast(io.AudioOutput, self.next_in_chain).clear_buffer()
+        self._segment = None
+        self._filler_end = None
+        self._play_end = time.time()
+        if self._paused_at is not None:
+            # nothing is queued anymore, only audio captured from now on waits
+            self._paused_at = self._play_end
+
+    def pause(self) -> None:
+        super().pause()
+        self._paused_at = time.time()
+
+    def resume(self) -> None:
+        super().resume()
+        if self._paused_at is not None:
+            # queued audio plays out after the pause
+            self._play_end += time.time() - self._paused_at
+            self._paused_at = None
+
+
+# --- Session Recording ---
+RECORDING_MAGIC = b"LKREC001"
+RECORD_AUDIO = 1
+RECORD_EVENT = 2
+# kind, seconds since session start, payload bytes
+_RECORD_HEADER = struct.Struct("<BdI")
+_AUDIO_HEADER = struct.Struct("<IH")  # sample rate, channels
+
+
+class SessionRecorder:
+    """Append-only recording of inbound user audio and session events.
+
+    The file grows in fixed-size memory-mapped segments, so capturing a frame is a
+    copy into the page cache instead of a write syscall. On close the file is
+    truncated to the bytes written; an unclosed recording keeps a zero-filled
+    tail, which the reader treats as the end of the recording.
+    """
+
+    def __init__(self, path: str, segment_bytes: int, header: dict):
+        granularity = mmap.ALLOCATIONGRANULARITY
+        self.path = path
+        self._segment_bytes = max(
+            granularity, -(-segment_bytes // granularity) * granularity
+        )
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o644)
+        self._segment_offset = 0
+        self._pos = 0
+        self._mm: mmap.mmap | None = None
+        self._map_segment()
+        self._t0 = time.monotonic()
+
+        payload = json.dumps({**header, "start_time": time.time()}).encode()
+        self._write(RECORDING_MAGIC)
+        self._write(struct.pack("<I", len(payload)))
+        self._write(payload)
+
+    @classmethod
+    def for_session(
+        cls, config: RecorderConfig, room: str, header: dict
+    ) -> "SessionRecorder":
+        os.makedirs(config.directory, exist_ok=True)
+        # room names come from the client, keep them from escaping the directory
+        safe_room = re.sub(r"[^A-Za-z0-9_-]", "_", room)[:64] or "room"
+        filename = f"{safe_room}-{datetime.now():%Y%m%dT%H%M%S}-{os.getpid()}.lkrec"
+        return cls(
+            os.path.join(config.directory, filename),
+            config.segment_bytes,
+            {**header, "room": room},
+        )
+
+    def _map_segment(self) -> None:
+        os.ftruncate(self._fd, self._segment_offset + self._segment_bytes)
+        self._mm = mmap.mmap(self._fd, self._segment_bytes, offset=self._segment_offset)
+        self._pos = 0
+
+    def _write(self, data: bytes | memoryview) -> None:
+        view = memoryview(data).cast("B")
+        while view:
+            if self._pos == self._segment_bytes:
+                self._mm.close()  # pyright: ignore[reportOptionalMemberAccess]
+                self._segment_offset += self._segment_bytes
+                self._map_segment()
+            n = min(len(view), self._segment_bytes - self._pos)
+            self._mm[self._pos : self._pos + n] = view[:n]  # pyright: ignore[reportOptionalSubscript]
+            self._pos += n
+            view = view[n:]
+
+    def _append(self, kind: int, *parts: bytes | memoryview) -> None:
+        if self._mm is None:
+            return
+        length = sum(memoryview(p).nbytes for p in parts)
+        self._write(_RECORD_HEADER.pack(kind, time.monotonic() - self._t0, length))
+        for part in parts:
+            self._write(part)
+
+    def record_audio(self, frame: rtc.AudioFrame) -> None:
+        self._append(
+            RECORD_AUDIO,
+            _AUDIO_HEADER.pack(frame.sample_rate, frame.num_channels),
+            frame.data,
+        )
+
+    def record_event(self, event_type: str, **data) -> None:
+        self._append(RECORD_EVENT, json.dumps({"type": event_type, **data}).encode())
+
+    async def tee_audio(
+        self, audio: AsyncIterable[rtc.AudioFrame]
+    ) -> AsyncIterable[rtc.AudioFrame]:
+        async for frame in audio:
+            self.record_audio(frame)
+            yield frame
+
+    def attach(self, session: AgentSession) -> None:
+        """Subscribe to the session events needed to replay the conversation."""
+
+        @session.on("user_state_changed")
+        def _on_user_state(ev: UserStateChangedEvent) -> None:
+            self.record_event("user_state", old=ev.old_state, new=ev.new_state)
+
+        @session.on("agent_state_changed")
+        def _on_agent_state(ev: AgentStateChangedEvent) -> None:
+            self.record_event("agent_state", old=ev.old_state, new=ev.new_state)
+
+        @session.on("user_input_transcribed")
+        def _on_transcript(ev: UserInputTranscribedEvent) -> None:
+            self.record_event("transcript", text=ev.transcript, is_final=ev.is_final)
+
+        @session.on("conversation_item_added")
+        def _on_item(ev: ConversationItemAddedEvent) -> None:
+            if isinstance(ev.item, ChatMessage):
+                self.record_event(
+                    "conversation_item",
+                    role=ev.item.role,
+                    text=ev.item.text_content,
+                    interrupted=ev.item.interrupted,
+                )
+
+        @session.on("metrics_collected")
+        def _on_metrics(ev: MetricsCollectedEvent) -> None:
+            self.record_event("metrics", metrics=ev.metrics.model_dump(mode="json"))
+
+    async def aclose(self) -> None:
+        if self._mm is None:
+            return
+        size = self._segment_offset + self._pos
+        self._mm.flush()
+        self._mm.close()
+        self._mm = None
+        os.ftruncate(self._fd, size)
+        os.close(self._fd)
+        logger.info("Session recording saved", extra={"path": self.path, "bytes": size})
+
+
+def read_recording(path: str) -> tuple[dict, Iterator[tuple[int, float, object]]]:
+    """Return the header of a recording and an iterator over its records.
+
+    Audio records yield ``(sample_rate, num_channels, pcm_bytes)``; event records
+    yield the decoded event dict.
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    if not data.startswith(RECORDING_MAGIC):
+        raise ValueError(f"Not a session recording: {path}")
+    offset = len(RECORDING_MAGIC)
+    (header_len,) = struct.unpack_from("<I", data, offset)
+    offset += 4
+    header = json.loads(data[offset : offset + header_len])
+    offset += header_len
+
+    def _records() -> Iterator[tuple[int, float, object]]:
+        pos = offset
+        while pos + _RECORD_HEADER.size <= len(data):
+            kind, t, length = _RECORD_HEADER.unpack_from(data, pos)
+            if kind == 0:  # zero-filled tail of a recording that was never closed
+                break
+            pos += _RECORD_HEADER.size
+            payload = data[pos : pos + length]
+            pos += length
+            if kind == RECORD_AUDIO:
+                sample_rate, channels = _AUDIO_HEADER.unpack_from(payload)
+                yield kind, t, (sample_rate, channels, payload[_AUDIO_HEADER.size :])
+            else:
+                yield kind, t, json.loads(payload)
+
+    return header, _records()
+
+
 # --- Agent Logic (Uses Dependency Injection) ---
+def _estimate_tokens(items: list) -> int:
+    # roughly four characters per token, as for OpenAI-style tokenizers
+    chars = sum(
+        len(item.text_content or "") for item in items if isinstance(item, ChatMessage)
+    )
+    return chars // 4
+
+
+# marks a turn answered from the semantic cache
+CACHE_HIT_ID = "semantic_cache_hit"
+
+
 class PreResponseAgent(Agent):
     def __init__(
         self,
@@ -698,6 +3145,11 @@ class PreResponseAgent(Agent):
         metrics_mgr: MetricsManager,
         primary_llm: llm.LLM,
         fast_llm: llm.LLM,
+        recorder: SessionRecorder | None = None,
+        tracer: SessionTracer | None = None,
+        semantic_cache: SemanticCache | None = None,
+        rate_limiter: RateLimiter | None = None,
+        audit_llm: llm.LLM | None = None,
     ):
         super().__init__(
             instructions=config.agent_instructions,
@@ -707,46 +3159,349 @@ class PreResponseAgent(Agent):
         self._config = config
         self._metrics_mgr = metrics_mgr
         self._fast_llm = fast_llm
+        self._recorder = recorder
+        self._tracer = tracer
+        # one scope per speech, preemptive replies run before their turn completes
+        self._speech_scopes: dict[str, tuple[SpeechHandle, TurnScope]] = {}
+        self._semantic_cache = semantic_cache
+        # question and semantic cache lookup of the latest turn
+        self._cache_lookup: tuple[str, asyncio.Task[dict | None]] | None = None
+        self._audit_tasks: set[asyncio.Task] = set()
+        # a separate instance, so audit requests stay out of the session's metrics
+        self._audit_llm = audit_llm
+        self._rate_limiter = rate_limiter
         self._fast_llm_prompt = llm.ChatMessage(
             role="system",
             content=[config.fast_llm_prompt],
         )
 
+    async def stt_node(
+        self, audio: AsyncIterable[rtc.AudioFrame], model_settings: ModelSettings
+    ) -> AsyncIterable[stt.SpeechEvent]:
+        if self._recorder is not None and self._config.recorder.record_audio:
+            audio = self._recorder.tee_audio(audio)
+        async for event in Agent.default.stt_node(self, audio, model_settings):
+            yield event
+
+    async def llm_node(
+        self,
+        chat_ctx: ChatContext,
+        tools: list[llm.FunctionTool | llm.RawFunctionTool],
+        model_settings: ModelSettings,
+    ) -> AsyncIterable[llm.ChatChunk | str]:
+        user_messages = [
+            item
+            for item in chat_ctx.items
+            if item.type == "message" and item.role == "user"
+        ]
+        # a preemptive reply has its own copy of the user message, so turns are
+        # matched by their text
+        question = user_messages[-1].text_content if user_messages else None
+        lookup = None
+        if self._cache_lookup is not None and self._cache_lookup[0] == question:
+            lookup = self._cache_lookup[1]
+        cache_turn = lookup.result() if lookup is not None and lookup.done() else None
+        if cache_turn is not None and "answer" in cache_turn:
+            self._cache_lookup = None
+            if (
+                self._audit_llm is not None
+                and cast(SemanticCache, self._semantic_cache).should_audit()
+            ):
+                audit_ctx = chat_ctx.copy()
+                audit_ctx.items = [
+                    item for item in audit_ctx.items if item.id != CACHE_HIT_ID
+                ]
+                task = asyncio.create_task(self._audit_cache_hit(audit_ctx, cache_turn))
+                self._audit_tasks.add(task)
+                task.add_done_callback(self._audit_tasks.discard)
+            yield cache_turn["answer"]
+            return
+
+        scope = self._speech_scope()
+        scope.restart()
+        if self._rate_limiter is not None:
+            max_wait = min(self._config.rate_limit.primary_max_wait, scope.remaining())
+            # past max_wait the answer is sent anyway, the gateway may still take it
+            await self._acquire_rate_limit(
+                self._config.primary_llm,
+                _estimate_tokens(chat_ctx.items),
+                "primary",
+                max_wait,
+            )
+
+        source = Agent.default.llm_node(self, chat_ctx, tools, model_settings)
+        answer: list[str] = []
+        chars = 0
+        used_tools = False
+        try:
+            async for chunk in scope.guard(source):
+                if isinstance(chunk, str):
+                    text = chunk
+                elif chunk.delta is not None:
+                    text = chunk.delta.content or ""
+                    if chunk.delta.tool_calls:
+                        # answers that depend on tools are not cacheable
+                        used_tools = True
+                else:
+                    text = ""
+                if text:
+                    answer.append(text)
+                    chars += len(text)
+                yield chunk
+        except TurnStopped as e:
+            self._metrics_mgr.record_stream_stop(
+                "primary.llm", e.reason, self._config.primary_llm.model, chars // 4
+            )
+        except (asyncio.CancelledError, GeneratorExit):
+            self._metrics_mgr.record_stream_stop(
+                "primary.llm", "interrupted", self._config.primary_llm.model, chars // 4
+            )
+            raise
+        else:
+            # answers to follow-up questions depend on the earlier turns
+            if (
+                lookup is not None
+                and answer
+                and not used_tools
+                and len(user_messages) == 1
+            ):
+                # a preemptive reply can finish before its turn's lookup
+                cache_turn = await asyncio.shield(lookup)
+                if cache_turn is not None and "answer" not in cache_turn:
+                    self._cache_lookup = None
+                    cast(SemanticCache, self._semantic_cache).store(
+                        cache_turn["intent"], cache_turn["vector"], "".join(answer)
+                    )
+
+    async def _acquire_rate_limit(
+        self, config: LLMConfig, prompt_tokens: int, priority: str, max_wait: float
+    ) -> bool:
+        """Wait for the node-wide rate limit of ``config``; False if the request should be dropped."""
+        if self._rate_limiter is None:
+            return True
+        tokens = prompt_tokens + self._metrics_mgr.expected_completion_tokens(
+            config.model
+        )
+        waited = await self._rate_limiter.acquire(config, tokens, priority, max_wait)
+        self._metrics_mgr.record_rate_limit(priority, config.model, waited)
+        return waited is not None
+
+    async def _lookup_cache(self, question: str) -> dict | None:
+        cache = cast(SemanticCache, self._semantic_cache)
+        start = time.perf_counter()
+        result = None
+        try:
+            result = await asyncio.wait_for(
+                cache.lookup(question), self._config.semantic_cache.lookup_timeout
+            )
+            if result is None:
+                outcome = "uncacheable"
+            else:
+                outcome = "hit" if "answer" in result else "miss"
+        except asyncio.TimeoutError:
+            outcome = "timeout"
+        except Exception as e:
+            logger.warning(f"Semantic cache lookup failed: {e}")
+            outcome = "error"
+        self._metrics_mgr.record_cache_lookup(
+            outcome,
+            result["intent"] if result is not None else "none",
+            (time.perf_counter() - start) * 1000,
+        )
+        return result
+
+    async def _audit_cache_hit(self, chat_ctx: ChatContext, cache_turn: dict) -> None:
+        """Ask the primary LLM anyway and check that it agrees with the cached answer."""
+        cache = cast(SemanticCache, self._semantic_cache)
+        if not await self._acquire_rate_limit(
+            self._config.primary_llm, _estimate_tokens(chat_ctx.items), "audit", 0.0
+        ):
+            return
+        try:
+            stream = cast(llm.LLM, self._audit_llm).chat(chat_ctx=chat_ctx)
+            fresh = "".join([chunk async for chunk in stream.to_str_iterable()])
+            agrees = await cache.audit(cache_turn["id"], cache_turn["answer"], fresh)
+        except Exception as e:
+            logger.warning(f"Semantic cache audit failed: {e}")
+            return
+        self._metrics_mgr.record_cache_audit(cache_turn["intent"], agrees)
+        if not agrees:
+            logger.info(
+                "Semantic cache false hit",
+                extra={
+                    "intent": cache_turn["intent"],
+                    "similarity": cache_turn["similarity"],
+                    "cached": cache_turn["answer"],
+                    "fresh": fresh,
+                },
+            )
+
+    async def tts_node(
+        self, text: AsyncIterable[str], model_settings: ModelSettings
+    ) -> AsyncIterable[rtc.AudioFrame]:
+        source = Agent.default.tts_node(self, text, model_settings)
+        scope = self._speech_scope()
+        handle = _SpeechHandleContextVar.get(None)
+        stage = (
+            "filler.tts"
+            if handle is not None and self._metrics_mgr.is_filler_speech(handle.id)
+            else "primary.tts"
+        )
+        try:
+            async for frame in scope.guard(source):
+                yield frame
+        except TurnStopped as e:
+            self._metrics_mgr.record_stream_stop(stage, e.reason)
+        except (asyncio.CancelledError, GeneratorExit):
+            self._metrics_mgr.record_stream_stop(stage, "interrupted")
+            raise
+
+    def _speech_scope(self) -> TurnScope:
+        """The scope of the speech the calling node generates, created on first use."""
+        handle = _SpeechHandleContextVar.get(None)
+        if handle is None:
+            return TurnScope(self._config.turn_budget)
+        if handle.id not in self._speech_scopes:
+            self._speech_scopes[handle.id] = (
+                handle,
+                TurnScope(self._config.turn_budget),
+            )
+            handle.add_done_callback(lambda h: self._speech_scopes.pop(h.id, None))
+        return self._speech_scopes[handle.id][1]
+
+    def cancel_turn(self, reason: str) -> None:
+        """Close every stream still running for replies to earlier turns.
+
+        A preemptive reply to the turn being completed is not scheduled yet and
+        keeps running.
+        """
+        for handle, scope in list(self._speech_scopes.values()):
+            if handle.scheduled or reason != "superseded":
+                scope.cancel(reason)
+
     async def on_user_turn_completed(
         self, turn_ctx: ChatContext, new_message: ChatMessage
     ):
+        self.cancel_turn("superseded")
+
+        if self._tracer is not None:
+            self._tracer.begin_turn(
+                user_chars=len(new_message.text_content or ""),
+                context_items=len(turn_ctx.items),
+            )
+
+        lookup = None
+        self._cache_lookup = None
+        if self._semantic_cache is not None:
+            question = new_message.text_content or ""
+            # runs alongside the filler's LLM call, which stays silent on a hit
+            lookup = asyncio.create_task(self._lookup_cache(question))
+            self._cache_lookup = (question, lookup)
+
+        await self._speak_filler(turn_ctx, new_message, lookup)
+
+        if lookup is not None:
+            cache_turn = await asyncio.shield(lookup)
+            if cache_turn is not None and "answer" in cache_turn:
+                # the changed context makes the session drop a preemptive reply,
+                # its replacement is served from the cache by llm_node
+                turn_ctx.add_message(
+                    role="system",
+                    content="The answer was served from the semantic cache.",
+                    id=CACHE_HIT_ID,
+                )
+
+    async def _speak_filler(
+        self,
+        turn_ctx: ChatContext,
+        new_message: ChatMessage,
+        lookup: asyncio.Task[dict | None] | None,
+    ) -> None:
+        async def _cache_hit() -> bool:
+            cache_turn = await asyncio.shield(lookup) if lookup is not None else None
+            return cache_turn is not None and "answer" in cache_turn
+
+        # turn_ctx already holds the instructions
+        if not self._metrics_mgr.should_emit_filler(
+            _estimate_tokens(turn_ctx.items), _estimate_tokens([new_message])
+        ):
+            return
+
         fast_llm_ctx = turn_ctx.copy(
             exclude_instructions=True, exclude_function_call=True
         ).truncate(max_items=3)
         fast_llm_ctx.items.insert(0, self._fast_llm_prompt)
         fast_llm_ctx.items.append(new_message)
+        # under gateway pressure the filler is the first thing to go
+        if not await self._acquire_rate_limit(
+            self._config.fast_llm,
+            _estimate_tokens(fast_llm_ctx.items),
+            "filler",
+            self._config.rate_limit.filler_max_wait,
+        ):
+            return
 
         fast_llm_fut = asyncio.Future[str]()
+        budget = self._config.turn_budget
+        fast_model = self._config.fast_llm.model
 
         async def _fast_llm_reply() -> AsyncIterable[str]:
+            # runs in the filler speech, so it shares the scope of its TTS stream
+            scope = self._speech_scope()
             filler_response = ""
             start_time = time.time()
             ttfb_recorded = False
-            async for chunk in self._fast_llm.chat(
-                chat_ctx=fast_llm_ctx
-            ).to_str_iterable():
-                if not ttfb_recorded:
-                    ttfb = (time.time() - start_time) * 1000
-                    self._metrics_mgr.llm_latency_small.labels(
-                        model=self._config.fast_llm.model,
-                        agent_type=self._config.agent_type,
-                    ).set(ttfb)
-                    logger.info(
-                        "Fast LLM TTFB",
-                        extra={
-                            "ttfb_ms": ttfb,
-                            "model": self._config.fast_llm.model,
-                            "timestamp": datetime.utcnow().isoformat(),
-                        },
+            ttfb = 0.0
+            cached = False
+            try:
+                async for chunk in scope.guard(
+                    self._fast_llm.chat(chat_ctx=fast_llm_ctx).to_str_iterable(),
+                    first_item_timeout=budget.filler_deadline,
+                ):
+                    if not ttfb_recorded and await _cache_hit():
+                        # the cached answer starts right away, no filler needed
+                        cached = True
+                        break
+                    if not ttfb_recorded:
+                        ttfb = (time.time() - start_time) * 1000
+                        self._metrics_mgr.labels(
+                            self._metrics_mgr.llm_latency_small,
+                            model=fast_model,
+                            agent_type=self._config.agent_type,
+                        ).set(ttfb)
+                        logger.info(
+                            "Fast LLM TTFB",
+                            extra={
+                                "ttfb_ms": ttfb,
+                                "model": fast_model,
+                                "timestamp": datetime.utcnow().isoformat(),
+                            },
+                        )
+                        ttfb_recorded = True
+                    filler_response += chunk
+                    yield chunk
+            except TurnStopped as e:
+                self._metrics_mgr.record_stream_stop(
+                    "filler.llm", e.reason, fast_model, len(filler_response) // 4
+                )
+                if e.reason == "deadline" and not filler_response:
+                    self._metrics_mgr.record_filler_fallback(budget.filler_fallback)
+                    if budget.filler_fallback == "static" and not await _cache_hit():
+                        filler_response = budget.fallback_text
+                        yield filler_response
+            except (asyncio.CancelledError, GeneratorExit):
+                self._metrics_mgr.record_stream_stop(
+                    "filler.llm", "interrupted", fast_model, len(filler_response) // 4
+                )
+                raise
+            else:
+                if not cached:
+                    self._metrics_mgr.observe_completion(
+                        fast_model, len(filler_response) // 4
                     )
-                    ttfb_recorded = True
-                filler_response += chunk
-                yield chunk
+            finally:
+                if not fast_llm_fut.done():
+                    fast_llm_fut.set_result(filler_response)
 
             end_time = time.time()
             duration_ms = (end_time - start_time) * 1000
@@ -754,19 +3509,39 @@ class PreResponseAgent(Agent):
                 "Fast LLM response total duration",
                 extra={
                     "duration_ms": duration_ms,
-                    "model": self._config.fast_llm.model,
+                    "model": fast_model,
                     "response": filler_response,
                     "timestamp": datetime.utcnow().isoformat(),
                 },
             )
-            fast_llm_fut.set_result(filler_response)
+            if self._tracer is not None:
+                self._tracer.record(
+                    "filler.llm",
+                    start_time,
+                    end_time,
+                    model=fast_model,
+                    ttft_ms=ttfb if ttfb_recorded else None,
+                )
+            if self._recorder is not None:
+                self._recorder.record_event(
+                    "filler",
+                    text=filler_response,
+                    ttft=ttfb / 1000 if ttfb_recorded else None,
+                    duration=duration_ms / 1000,
+                )
 
-        self.session.say(_fast_llm_reply(), add_to_chat_ctx=False)
+        handle = self.session.say(_fast_llm_reply(), add_to_chat_ctx=False)
+        self._metrics_mgr.mark_filler_speech(handle.id)
+        # the speech can be interrupted before the reply generator ever runs
+        handle.add_done_callback(
+            lambda _: fast_llm_fut.done() or fast_llm_fut.set_result("")
+        )
         filler_response = await fast_llm_fut
         logger.info(f"Fast response: {filler_response}")
-        turn_ctx.add_message(
-            role="assistant", content=filler_response, interrupted=False
-        )
+        if filler_response:
+            turn_ctx.add_message(
+                role="assistant", content=filler_response, interrupted=False
+            )
 
 
 async def pre_warmup_test(llm: llm.LLM, tts: tts.TTS, stt: stt.STT) -> None:
@@ -803,6 +3578,83 @@ async def pre_warmup_test(llm: llm.LLM, tts: tts.TTS, stt: stt.STT) -> None:
     logger.debug(f"STT test transcription: {stt_result.alternatives}")
 
 
+async def wait_for_audio_ready(room: rtc.Room, timeout: float) -> bool:
+    """Wait until a participant's audio is subscribed and the agent's audio is published.
+
+    Returns False if the tracks were not ready within ``timeout`` seconds.
+    """
+    subscribed = asyncio.Event()
+    published = asyncio.Event()
+
+    def _check(*_) -> None:
+        for participant in room.remote_participants.values():
+            for pub in participant.track_publications.values():
+                if pub.kind == rtc.TrackKind.KIND_AUDIO and pub.subscribed:
+                    subscribed.set()
+        for pub in room.local_participant.track_publications.values():
+            if pub.kind == rtc.TrackKind.KIND_AUDIO:
+                published.set()
+
+    room.on("track_subscribed", _check)
+    room.on("local_track_published", _check)
+    try:
+        _check()
+        await asyncio.wait_for(
+            asyncio.gather(subscribed.wait(), published.wait()), timeout
+        )
+        return True
+    except asyncio.TimeoutError:
+        return False
+    finally:
+        room.off("track_subscribed", _check)
+        room.off("local_track_published", _check)
+
+
+async def presynthesize(tts_config: TTSConfig, text: str) -> list[rtc.AudioFrame]:
+    # prewarm runs outside a job, so the plugins need their own HTTP session
+    http_context._new_session_ctx()
+    try:
+        tts_plugin = PluginRegistry().create_tts(tts_config)
+        frames = []
+        async with tts_plugin.synthesize(text) as stream:
+            async for ev in stream:
+                frames.append(ev.frame)
+        await tts_plugin.aclose()
+        return frames
+    finally:
+        await http_context._close_http_ctx()
+
+
+async def _replay_frames(frames: list[rtc.AudioFrame]) -> AsyncIterable[rtc.AudioFrame]:
+    for frame in frames:
+        yield frame
+
+
+def create_session(
+    stt_plugin: stt.STT,
+    tts_plugin: tts.TTS,
+    vad_plugin: vad.VAD,
+    endpointing: EndpointingConfig | None = None,
+) -> AgentSession:
+    endpointing = endpointing or EndpointingConfig()
+    return AgentSession(
+        stt=stt_plugin,
+        tts=tts_plugin,
+        vad=vad_plugin,
+        turn_detection=load_turn_detector()()
+        if endpointing.turn_detector
+        else NOT_GIVEN,
+        min_endpointing_delay=endpointing.min_delay,
+        max_endpointing_delay=endpointing.max_delay,
+        preemptive_generation=True,
+        # sometimes background noise could interrupt the agent session, these are considered false positive interruptions
+        # when it's detected, you may resume the agent's speech
+        resume_false_interruption=True,
+        false_interruption_timeout=1.0,
+        min_interruption_duration=0.2,  # with false interruption resume, interruption can be more sensitive
+    )
+
+
 # --- Application Entrypoint (Composition Root) ---
 async def entrypoint(ctx: JobContext):
     if not ctx.proc.userdata.get("vad", None):
@@ -811,7 +3663,23 @@ async def entrypoint(ctx: JobContext):
     config = AppConfig()
     logger.info("Loaded application config", extra={"config": config.model_dump()})
 
-    metrics_mgr = MetricsManager(config)
+    tracer = None
+    if config.tracing.enabled:
+        tracer = SessionTracer.for_session(
+            config.tracing,
+            {
+                "service.name": config.agent_type,
+                "room": ctx.room.name,
+                "primary_llm.model": config.primary_llm.model,
+                "fast_llm.model": config.fast_llm.model,
+                "stt.provider": config.stt.provider,
+                "tts.provider": config.tts.provider,
+            },
+        )
+        ctx.add_shutdown_callback(tracer.aclose)
+
+    metrics_mgr = MetricsManager(config, tracer=tracer)
+    metrics_mgr.set_room(ctx.room.name)
     plugin_registry = PluginRegistry()
 
     primary_llm = plugin_registry.create_llm(config.primary_llm)
@@ -820,40 +3688,113 @@ async def entrypoint(ctx: JobContext):
     tts_plugin = plugin_registry.create_tts(config.tts)
     vad_plugin = ctx.proc.userdata["vad"]
 
+    recorder = None
+    if config.recorder.enabled:
+        recorder = SessionRecorder.for_session(
+            config.recorder,
+            room=ctx.room.name,
+            header={
+                "agent_type": config.agent_type,
+                "primary_llm": config.primary_llm.model,
+                "fast_llm": config.fast_llm.model,
+                "stt": config.stt.provider,
+                "tts": config.tts.provider,
+                "vad": config.vad.model_dump(),
+            },
+        )
+        ctx.add_shutdown_callback(recorder.aclose)
+
+    rate_limiter = None
+    if config.rate_limit.enabled:
+        rate_limiter = RateLimiter.get(config.rate_limit)
+
+    semantic_cache = None
+    audit_llm = None
+    if config.semantic_cache.enabled:
+        semantic_cache = SemanticCache.get(config.semantic_cache)
+        semantic_cache.prime()
+        if config.semantic_cache.audit_rate > 0:
+            audit_llm = plugin_registry.create_llm(config.primary_llm)
+
     agent = PreResponseAgent(
         config=config,
         metrics_mgr=metrics_mgr,
         primary_llm=primary_llm,
         fast_llm=fast_llm,
+        recorder=recorder,
+        tracer=tracer,
+        semantic_cache=semantic_cache,
+        rate_limiter=rate_limiter,
+        audit_llm=audit_llm,
     )
 
-    session = AgentSession(
-        stt=stt_plugin,
-        tts=tts_plugin,
-        vad=vad_plugin,
-        preemptive_generation=True,
-        # sometimes background noise could interrupt the agent session, these are considered false positive interruptions
-        # when it's detected, you may resume the agent's speech
-        resume_false_interruption=True,
-        false_interruption_timeout=1.0,
-        min_interruption_duration=0.2,  # with false interruption resume, interruption can be more sensitive
+    session = create_session(
+        stt_plugin,
+        tts_plugin,
+        vad_plugin,
+        config.endpointing,
     )
+    session.on("close", lambda _: agent.cancel_turn("session_closed"))
+    if recorder is not None:
+        recorder.attach(session)
+    if tracer is not None:
+        tracer.attach(session)
+    if config.endpointing.adaptive:
+        AdaptiveEndpointing(
+            config.endpointing, config.vad.min_silence_duration, metrics_mgr
+        ).attach(session)
 
     session.on("metrics_collected", metrics_mgr.handle_event)
     metrics_mgr.session_started()
     atexit.register(metrics_mgr.decrement_active_conversations)
     ctx.add_shutdown_callback(metrics_mgr.log_session_summary)
 
+    greeting = config.greeting
     logger.info(f"connecting to room {ctx.room.name}")
     await ctx.connect(auto_subscribe=AutoSubscribe.AUDIO_ONLY)
+    joined_at = time.perf_counter()
+
+    @session.on("agent_state_changed")
+    def _on_first_audio(ev: AgentStateChangedEvent) -> None:
+        if ev.new_state == "speaking":
+            session.off("agent_state_changed", _on_first_audio)
+            metrics_mgr.record_time_to_first_audio(time.perf_counter() - joined_at)
 
     await session.start(
         agent,
         room=ctx.room,
     )
+    if config.audio_probe.enabled and session.output.audio is not None:
+        AudioProbe(
+            session.output.audio,
+            config.audio_probe,
+            config.vad.min_silence_duration,
+            metrics_mgr,
+        ).attach(session)
+
+    if not await wait_for_audio_ready(ctx.room, greeting.ready_timeout):
+        logger.warning(
+            "Audio tracks not ready before greeting timeout",
+            extra={"timeout_s": greeting.ready_timeout},
+        )
 
-    await asyncio.sleep(0.7)
-    await session.say("Hi there, how are you doing today?", allow_interruptions=True)
+    # without prewarmed audio the greeting is streamed from the TTS
+    frames = ctx.proc.userdata.get("greeting_frames")
+    if frames:
+        metrics_mgr.record_greeting_tts(
+            len(greeting.text), sum(f.duration for f in frames)
+        )
+    if recorder is not None:
+        recorder.record_event(
+            "greeting",
+            text=greeting.text,
+            audio_duration=sum(f.duration for f in frames) if frames else None,
+        )
+    await session.say(
+        greeting.text,
+        audio=_replay_frames(frames) if frames else NOT_GIVEN,
+        allow_interruptions=True,
+    )
 
 
 def prewarm(proc: JobProcess):
@@ -873,12 +3814,34 @@ def prewarm(proc: JobProcess):
     #     raise
     proc.userdata["vad"] = silero.VAD.load(**config.vad.model_dump())
 
+    greeting = config.greeting
+    if greeting.presynthesize:
+        try:
+            proc.userdata["greeting_frames"] = asyncio.run(
+                asyncio.wait_for(
+                    presynthesize(config.tts, greeting.text),
+                    greeting.presynthesize_timeout,
+                )
+            )
+        except Exception as e:
+            logger.warning(f"Greeting pre-synthesis failed: {e}")
+
+    if config.semantic_cache.enabled:
+        try:
+            SemanticCache.prepare(config.semantic_cache)
+        except Exception as e:
+            logger.warning(f"Embedding the semantic cache intents failed: {e}")
+
 
 if __name__ == "__main__":
     try:
         main_config = AppConfig()
+        reset_multiproc_dir(main_config.prometheus_multiproc_dir)
         main_metrics_mgr = MetricsManager(main_config)
         main_metrics_mgr.initialize_metrics()
+        if main_config.endpointing.turn_detector:
+            # the inference runner must be registered before the worker starts
+            load_turn_detector()
 
         cli.run_app(WorkerOptions(entrypoint_fnc=entrypoint, prewarm_fnc=prewarm))
     except Exception as e:
@@ -0,0 +1,524 @@
+"""Replay a recorded session through PreResponseAgent with timing-faithful stubs.
+
+The recorded user audio is fed back in real time through the production VAD and
+``AgentSession`` configuration, while STT, LLM and TTS are replaced by stubs that
+reproduce the transcripts, responses and TTFT/TTFB recorded in the original call.
+The resulting per-turn timeline can be saved and compared against another build.
+
+Usage:
+    python session-replay.py RECORDING [--output timeline.json] [--compare BASELINE]
+
+BASELINE may be a timeline written by ``--output`` or another ``.lkrec`` recording.
+"""
+
+import argparse
+import asyncio
+import importlib.util
+import json
+import re
+import time
+from collections import deque
+from collections.abc import AsyncIterable
+from pathlib import Path
+
+from livekit import rtc
+from livekit.agents import (
+    DEFAULT_API_CONNECT_OPTIONS,
+    NOT_GIVEN,
+    APIConnectOptions,
+    MetricsCollectedEvent,
+    NotGivenOr,
+    io,
+    llm,
+    stt,
+    tts,
+    utils,
+)
+from livekit.plugins import silero
+
+SETTLE_SECONDS = 5.0
+TTS_SAMPLE_RATE = 24000
+
+
+def load_worker():
+    """Import fast-preresponse.py, whose file name is not a valid module name."""
+    path = Path(__file__).with_name("fast-preresponse.py")
+    spec = importlib.util.spec_from_file_location("fast_preresponse", path)
+    module = importlib.util.module_from_spec(spec)  # pyright: ignore[reportArgumentType]
+    spec.loader.exec_module(module)  # pyright: ignore[reportOptionalMemberAccess]
+    return module
+
+
+class ReplayClock:
+    def __init__(self) -> None:
+        self._t0 = time.monotonic()
+
+    def now(self) -> float:
+        return time.monotonic() - self._t0
+
+    async def sleep_until(self, t: float) -> None:
+        delay = t - self.now()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+class ReplayScript:
+    """Everything the stubs need, extracted from a recording in order.
+
+    Responses are keyed by the user turn they answer rather than by call order,
+    since preemptive generation makes the LLM be called more than once per turn,
+    both in the recorded session and in the replay. A turn ends with the user
+    message being added to the conversation, and owns the final transcripts
+    before it. ``turn`` follows the replayed transcripts.
+    """
+
+    def __init__(self, records) -> None:
+        self.frames: list[tuple[float, int, int, bytes]] = []
+        # time, text, user turn
+        self.finals: deque[tuple[float, str, int]] = deque()
+        self.primary: dict[int, tuple[float, float, str]] = {}
+        self.fillers: dict[int, tuple[float, float, str]] = {}
+        self.tts: deque[tuple[float, float]] = deque()
+        self.greeting: tuple[float, str, float | None] | None = None
+        self.events: list[dict] = []
+        self.end = 0.0
+        self.turn = 0
+
+        turn = 0
+        pending_finals: list[tuple[float, str]] = []
+        pending_filler: tuple[float, float, str] | None = None
+        # the first completed primary LLM stream since the last assistant message
+        llm_timing: tuple[float, float] | None = None
+        for _kind, t, payload in records:
+            self.end = t
+            if isinstance(payload, tuple):
+                sample_rate, channels, pcm = payload
+                self.frames.append((t, sample_rate, channels, pcm))
+                continue
+            self.events.append({"t": t, **payload})
+            event_type = payload["type"]
+            if event_type == "transcript" and payload["is_final"]:
+                pending_finals.append((t, payload["text"]))
+            elif event_type == "filler":
+                # the filler finishes before its user message is added
+                pending_filler = (
+                    payload["ttft"] or 0.0,
+                    payload["duration"],
+                    payload["text"],
+                )
+            elif event_type == "greeting":
+                self.greeting = (t, payload["text"], payload.get("audio_duration"))
+            elif event_type == "conversation_item" and payload["role"] == "user":
+                turn += 1
+                self.finals.extend((ft, text, turn) for ft, text in pending_finals)
+                pending_finals = []
+                if pending_filler is not None:
+                    self.fillers[turn] = pending_filler
+                    pending_filler = None
+            elif event_type == "conversation_item" and payload["role"] == "assistant":
+                text = payload["text"] or ""
+                # The greeting is said verbatim and never reaches the LLM
+                if turn and turn not in self.primary:
+                    ttft, duration = llm_timing or (0.0, 0.0)
+                    self.primary[turn] = (ttft, duration, text)
+                llm_timing = None
+            elif event_type == "metrics":
+                m = payload["metrics"]
+                # cancelled streams are preemptive generations that were dropped
+                if m["type"] == "llm_metrics" and not m.get("cancelled"):
+                    llm_timing = llm_timing or (m["ttft"], m["duration"])
+                elif m["type"] == "tts_metrics":
+                    self.tts.append((m["ttfb"], m["audio_duration"]))
+        # transcripts of a turn the session ended before committing
+        self.finals.extend((ft, text, turn + 1) for ft, text in pending_finals)
+
+
+# --- Stub providers ---
+
+
+class ReplayLLM(llm.LLM):
+    def __init__(
+        self,
+        responses: dict[int, tuple[float, float, str]],
+        script: ReplayScript,
+        name: str,
+    ) -> None:
+        super().__init__()
+        self._responses = responses
+        self._script = script
+        self._name = name
+
+    @property
+    def model(self) -> str:
+        return f"replay-{self._name}"
+
+    def chat(
+        self,
+        *,
+        chat_ctx: llm.ChatContext,
+        tools: list | None = None,
+        conn_options: APIConnectOptions = DEFAULT_API_CONNECT_OPTIONS,
+        **kwargs,
+    ) -> "ReplayLLMStream":
+        # every call within a turn, preemptive or not, gets that turn's response
+        response = self._responses.get(self._script.turn, (0.0, 0.0, ""))
+        return ReplayLLMStream(
+            self,
+            chat_ctx=chat_ctx,
+            tools=tools or [],
+            conn_options=conn_options,
+            response=response,
+        )
+
+
+class ReplayLLMStream(llm.LLMStream):
+    def __init__(
+        self, llm_: ReplayLLM, *, response: tuple[float, float, str], **kwargs
+    ):
+        super().__init__(llm_, **kwargs)
+        self._response = response
+
+    async def _run(self) -> None:
+        ttft, duration, text = self._response
+        chunks = re.findall(r"\S+\s*", text) or [""]
+        step = max(duration - ttft, 0.0) / len(chunks)
+        request_id = utils.shortuuid()
+
+        await asyncio.sleep(ttft)
+        for i, chunk in enumerate(chunks):
+            if i:
+                await asyncio.sleep(step)
+            self._event_ch.send_nowait(
+                llm.ChatChunk(
+                    id=request_id,
+                    delta=llm.ChoiceDelta(role="assistant", content=chunk),
+                )
+            )
+        completion_tokens = len(chunks)
+        self._event_ch.send_nowait(
+            llm.ChatChunk(
+                id=request_id,
+                usage=llm.CompletionUsage(
+                    completion_tokens=completion_tokens,
+                    prompt_tokens=0,
+                    total_tokens=completion_tokens,
+                ),
+            )
+        )
+
+
+class ReplaySTT(stt.STT):
+    def __init__(self, script: ReplayScript, clock: ReplayClock) -> None:
+        super().__init__(
+            capabilities=stt.STTCapabilities(streaming=True, interim_results=False)
+        )
+        self._script = script
+        self._clock = clock
+
+    async def _recognize_impl(
+        self,
+        buffer: utils.AudioBuffer,
+        *,
+        language: NotGivenOr[str] = NOT_GIVEN,
+        conn_options: APIConnectOptions,
+    ) -> stt.SpeechEvent:
+        raise NotImplementedError("ReplaySTT only supports streaming")
+
+    def stream(
+        self,
+        *,
+        language: NotGivenOr[str] = NOT_GIVEN,
+        conn_options: APIConnectOptions = DEFAULT_API_CONNECT_OPTIONS,
+    ) -> "ReplaySTTStream":
+        return ReplaySTTStream(
+            stt=self, conn_options=conn_options, script=self._script, clock=self._clock
+        )
+
+
+class ReplaySTTStream(stt.RecognizeStream):
+    def __init__(self, *, script: ReplayScript, clock: ReplayClock, **kwargs) -> None:
+        super().__init__(**kwargs)
+        self._script = script
+        self._clock = clock
+
+    async def _run(self) -> None:
+        async def _drain_input() -> None:
+            async for _ in self._input_ch:
+                pass
+
+        drain_task = asyncio.create_task(_drain_input())
+        try:
+            # finals are shared with the STT so a restarted stream resumes in place
+            finals = self._script.finals
+            while finals:
+                t, text, turn = finals[0]
+                await self._clock.sleep_until(t)
+                finals.popleft()
+                self._script.turn = turn
+                self._event_ch.send_nowait(
+                    stt.SpeechEvent(
+                        type=stt.SpeechEventType.FINAL_TRANSCRIPT,
+                        alternatives=[stt.SpeechData(language="en", text=text)],
+                    )
+                )
+            await drain_task
+        finally:
+            await utils.aio.cancel_and_wait(drain_task)
+
+
+class ReplayTTS(tts.TTS):
+    def __init__(self, timings: deque[tuple[float, float]]) -> None:
+        super().__init__(
+            capabilities=tts.TTSCapabilities(streaming=False),
+            sample_rate=TTS_SAMPLE_RATE,
+            num_channels=1,
+        )
+        self._timings = timings
+
+    def synthesize(
+        self,
+        text: str,
+        *,
+        conn_options: APIConnectOptions = DEFAULT_API_CONNECT_OPTIONS,
+    ) -> "ReplayChunkedStream":
+        # Fall back to ~60 ms of audio per character when the recording runs out
+        timing = self._timings.popleft() if self._timings else (0.2, len(text) * 0.06)
+        return ReplayChunkedStream(
+            tts=self, input_text=text, conn_options=conn_options, timing=timing
+        )
+
+
+class ReplayChunkedStream(tts.ChunkedStream):
+    def __init__(self, *, timing: tuple[float, float], **kwargs) -> None:
+        super().__init__(**kwargs)
+        self._timing = timing
+
+    async def _run(self, output_emitter: tts.AudioEmitter) -> None:
+        ttfb, audio_duration = self._timing
+        output_emitter.initialize(
+            request_id=utils.shortuuid(),
+            sample_rate=TTS_SAMPLE_RATE,
+            num_channels=1,
+            mime_type="audio/pcm",
+        )
+        await asyncio.sleep(ttfb)
+        output_emitter.push(bytes(int(audio_duration * TTS_SAMPLE_RATE) * 2))
+        output_emitter.flush()
+
+
+# --- Session I/O ---
+
+
+class ReplayAudioInput(io.AudioInput):
+    def __init__(self, frames: list[tuple[float, int, int, bytes]], clock: ReplayClock):
+        super().__init__(label="ReplayAudioInput")
+        self._frames = iter(frames)
+        self._clock = clock
+
+    async def __anext__(self) -> rtc.AudioFrame:
+        try:
+            t, sample_rate, channels, pcm = next(self._frames)
+        except StopIteration:
+            raise StopAsyncIteration from None
+        await self._clock.sleep_until(t)
+        return rtc.AudioFrame(
+            data=pcm,
+            sample_rate=sample_rate,
+            num_channels=channels,
+            samples_per_channel=len(pcm) // (2 * channels),
+        )
+
+
+class ReplayAudioOutput(io.AudioOutput):
+    """Plays synthesized audio out in simulated real time."""
+
+    def __init__(self) -> None:
+        super().__init__(
+            label="ReplayAudioOutput",
+            capabilities=io.AudioOutputCapabilities(pause=False),
+        )
+        self._segment_start: float | None = None
+        self._segment_duration = 0.0
+        self._playout: asyncio.TimerHandle | None = None
+        self._playout_start = 0.0
+        self._playout_duration = 0.0
+
+    async def capture_frame(self, frame: rtc.AudioFrame) -> None:
+        await super().capture_frame(frame)
+        if self._segment_start is None:
+            self._segment_start = time.monotonic()
+            self._segment_duration = 0.0
+        self._segment_duration += frame.duration
+
+    def flush(self) -> None:
+        super().flush()
+        if self._segment_start is None:
+            return
+        self._playout_start = self._segment_start
+        self._playout_duration = self._segment_duration
+        self._segment_start = None
+        delay = self._playout_start + self._playout_duration - time.monotonic()
+        self._playout = asyncio.get_running_loop().call_later(
+            max(delay, 0.0), self._finish, self._playout_duration, False
+        )
+
+    def clear_buffer(self) -> None:
+        if self._playout is not None:
+            self._playout.cancel()
+            played = time.monotonic() - self._playout_start
+            self._finish(min(played, self._playout_duration), True)
+        elif self._segment_start is not None:
+            played = time.monotonic() - self._segment_start
+            self._segment_start = None
+            self._finish(min(played, self._segment_duration), True)
+
+    def _finish(self, position: float, interrupted: bool) -> None:
+        self._playout = None
+        self.on_playback_finished(playback_position=position, interrupted=interrupted)
+
+
+async def silence(duration: float) -> AsyncIterable[rtc.AudioFrame]:
+    samples = int(TTS_SAMPLE_RATE * 0.02)
+    for _ in range(int(duration / 0.02)):
+        yield rtc.AudioFrame.create(TTS_SAMPLE_RATE, 1, samples)
+
+
+# --- Timelines ---
+
+
+def turn_timeline(events: list[dict]) -> list[dict]:
+    """Group recorded metrics into turns keyed by the speech they produced."""
+    by_speech: dict[str, dict] = {}
+    turns: list[dict] = []
+    for ev in events:
+        if ev.get("type") != "metrics":
+            continue
+        m = ev["metrics"]
+        speech_id = m.get("speech_id")
+        if m["type"] == "eou_metrics":
+            turn = {
+                "t": round(ev["t"], 3),
+                "eou_ms": m["end_of_utterance_delay"] * 1000,
+                "transcription_ms": m["transcription_delay"] * 1000,
+                "llm_ttft_ms": None,
+                "tts_ttfb_ms": None,
+            }
+            turns.append(turn)
+            if speech_id:
+                by_speech[speech_id] = turn
+            continue
+        turn = by_speech.get(speech_id) if speech_id else (turns[-1] if turns else None)
+        if turn is None:
+            continue
+        if m.get("cancelled"):
+            continue
+        if m["type"] == "llm_metrics" and turn["llm_ttft_ms"] is None:
+            turn["llm_ttft_ms"] = m["ttft"] * 1000
+        elif m["type"] == "tts_metrics" and turn["tts_ttfb_ms"] is None:
+            turn["tts_ttfb_ms"] = m["ttfb"] * 1000
+
+    for turn in turns:
+        parts = [turn["eou_ms"], turn["llm_ttft_ms"], turn["tts_ttfb_ms"]]
+        turn["total_ms"] = sum(parts) if None not in parts else None
+    return turns
+
+
+def load_timeline(path: str, worker) -> list[dict]:
+    if path.endswith(".json"):
+        with open(path) as f:
+            return json.load(f)["turns"]
+    _, records = worker.read_recording(path)
+    return turn_timeline(ReplayScript(records).events)
+
+
+def print_comparison(title: str, baseline: list[dict], current: list[dict]) -> None:
+    def _fmt(value: float | None) -> str:
+        return "-" if value is None else f"{value:.0f}"
+
+    print(f"\n{title}")
+    print(f"{'turn':>4} {'stage':<12} {'baseline':>9} {'current':>9} {'delta':>8}")
+    for i, (base, cur) in enumerate(zip(baseline, current), start=1):
+        for key in ("eou_ms", "llm_ttft_ms", "tts_ttfb_ms", "total_ms"):
+            b, c = base.get(key), cur.get(key)
+            delta = "-" if b is None or c is None else f"{c - b:+.0f}"
+            print(f"{i:>4} {key[:-3]:<12} {_fmt(b):>9} {_fmt(c):>9} {delta:>8}")
+    if len(baseline) != len(current):
+        print(f"turn count differs: baseline={len(baseline)} current={len(current)}")
+
+
+async def replay(path: str, worker) -> list[dict]:
+    _, records = worker.read_recording(path)
+    script = ReplayScript(records)
+    config = worker.AppConfig()
+    metrics_mgr = worker.MetricsManager(config)
+    clock = ReplayClock()
+
+    agent = worker.PreResponseAgent(
+        config=config,
+        metrics_mgr=metrics_mgr,
+        primary_llm=ReplayLLM(script.primary, script, "primary"),
+        fast_llm=ReplayLLM(script.fillers, script, "fast"),
+    )
+    session = worker.create_session(
+        ReplaySTT(script, clock),
+        ReplayTTS(script.tts),
+        silero.VAD.load(**config.vad.model_dump()),
+        config.endpointing,
+    )
+    if config.endpointing.adaptive:
+        worker.AdaptiveEndpointing(
+            config.endpointing, config.vad.min_silence_duration, metrics_mgr
+        ).attach(session)
+    session.input.audio = ReplayAudioInput(script.frames, clock)
+    session.output.audio = ReplayAudioOutput()
+
+    events: list[dict] = []
+
+    @session.on("metrics_collected")
+    def _on_metrics(ev: MetricsCollectedEvent) -> None:
+        events.append(
+            {"t": clock.now(), "type": "metrics", "metrics": ev.metrics.model_dump()}
+        )
+
+    await session.start(agent)
+    if script.greeting is not None:
+        t, text, audio_duration = script.greeting
+        await clock.sleep_until(t)
+        # a pre-synthesized greeting bypasses TTS, so it has no recorded TTS timing
+        session.say(
+            text,
+            audio=silence(audio_duration) if audio_duration else NOT_GIVEN,
+            allow_interruptions=True,
+        )
+    await clock.sleep_until(script.end + SETTLE_SECONDS)
+    await session.aclose()
+    return turn_timeline(events)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("recording", help="Path to a .lkrec session recording")
+    parser.add_argument("--output", help="Write the replayed turn timeline as JSON")
+    parser.add_argument(
+        "--compare", help="Timeline JSON or recording to compare the replay against"
+    )
+    args = parser.parse_args()
+
+    worker = load_worker()
+    turns = asyncio.run(replay(args.recording, worker))
+
+    print_comparison(
+        "Recorded vs replayed", load_timeline(args.recording, worker), turns
+    )
+    if args.compare:
+        print_comparison(
+            f"{args.compare} vs replayed", load_timeline(args.compare, worker), turns
+        )
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"recording": args.recording, "turns": turns}, f, indent=2)
+        print(f"\nTimeline written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
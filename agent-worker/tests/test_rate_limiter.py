@@ -0,0 +1,61 @@
+import importlib.util
+import os
+import time
+
+import pytest
+
+pytest.importorskip("livekit.agents")
+
+spec = importlib.util.spec_from_file_location(
+    "fast_preresponse",
+    os.path.join(os.path.dirname(__file__), "..", "fast-preresponse.py"),
+)
+worker = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(worker)
+
+
+@pytest.fixture
+def limiter(tmp_path):
+    return worker.RateLimiter(
+        worker.RateLimitConfig(enabled=True, path=str(tmp_path / "buckets"))
+    )
+
+
+def llm_config(rps: float) -> "worker.LLMConfig":
+    return worker.LLMConfig(provider="openai", model="m", requests_per_second=rps)
+
+
+@pytest.mark.parametrize("rps, wait", [(0.5, 2.0), (1.0, 1.0), (1.2, 0.8 / 1.2)])
+def test_primary_gets_a_request_below_two_rps(limiter, rps, wait):
+    config = llm_config(rps)
+    key = limiter.bucket_key(config)
+    assert limiter._take(key, config, 0, 0.0) == 0.0
+    # the next request waits until the bucket holds a whole request again
+    assert limiter._take(key, config, 0, 0.0) == pytest.approx(wait, rel=0.05)
+
+
+@pytest.mark.parametrize("rps", [0.5, 1.0, 1.2])
+def test_filler_gets_a_full_bucket_below_two_rps(limiter, rps):
+    config = llm_config(rps)
+    key = limiter.bucket_key(config)
+    assert limiter._take(key, config, 0, 0.2) == 0.0
+    # the filler never drains the bucket below what the primary needs
+    assert limiter._take(key, config, 0, 0.2) > 0.0
+
+
+def test_filler_leaves_reserve_for_primary(limiter):
+    config = llm_config(5.0)
+    key = limiter.bucket_key(config)
+    taken = 0
+    while limiter._take(key, config, 0, 0.2) == 0.0:
+        taken += 1
+    assert taken == 4
+    assert limiter._take(key, config, 0, 0.0) == 0.0
+
+
+def test_primary_waits_for_refill(limiter):
+    config = llm_config(0.5)
+    key = limiter.bucket_key(config)
+    assert limiter._take(key, config, 0, 0.0) == 0.0
+    time.sleep(0.1)
+    assert limiter._take(key, config, 0, 0.0) == pytest.approx(1.9, abs=0.05)
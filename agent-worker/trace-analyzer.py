@@ -0,0 +1,232 @@
+"""Offline analysis of the per-turn span files written by the agent worker.
+
+Reads OTLP/JSON span lines (``spans.jsonl`` and its rotated backups) and
+prints per-stage percentiles, the critical path from end of user speech to the
+first filler audio and to the answer audio, and the slowest turns.
+
+Usage:
+    python trace-analyzer.py [PATH ...] [--slowest N]
+
+PATH may be a span file or a directory of span files (default /tmp/agent-traces).
+"""
+
+import argparse
+import glob
+import json
+import math
+import os
+from collections import defaultdict
+
+DEFAULT_DIRECTORY = "/tmp/agent-traces"
+PERCENTILES = (50, 90, 95, 99)
+
+
+def _attr_value(value: dict):
+    if "intValue" in value:
+        return int(value["intValue"])
+    for key in ("doubleValue", "boolValue", "stringValue"):
+        if key in value:
+            return value[key]
+    return None
+
+
+def _attrs(items: list[dict]) -> dict:
+    return {item["key"]: _attr_value(item["value"]) for item in items}
+
+
+def read_spans(paths: list[str]) -> list[dict]:
+    files: list[str] = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(sorted(glob.glob(os.path.join(path, "spans*.jsonl*"))))
+        else:
+            files.append(path)
+
+    spans = []
+    for file in files:
+        with open(file) as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                for resource_spans in json.loads(line)["resourceSpans"]:
+                    resource = _attrs(resource_spans["resource"]["attributes"])
+                    for scope_spans in resource_spans["scopeSpans"]:
+                        for span in scope_spans["spans"]:
+                            start = int(span["startTimeUnixNano"]) / 1e9
+                            end = int(span["endTimeUnixNano"]) / 1e9
+                            spans.append(
+                                {
+                                    "trace_id": span["traceId"],
+                                    "span_id": span["spanId"],
+                                    "parent_id": span.get("parentSpanId", ""),
+                                    "name": span["name"],
+                                    "start": start,
+                                    "end": end,
+                                    "duration_ms": (end - start) * 1000,
+                                    "attrs": _attrs(span.get("attributes", [])),
+                                    "resource": resource,
+                                }
+                            )
+    return spans
+
+
+def percentile(values: list[float], p: float) -> float:
+    ordered = sorted(values)
+    # nearest rank
+    index = max(0, min(len(ordered) - 1, math.ceil(p / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def _first_output(span: dict | None, key: str) -> float | None:
+    """Time the stage produced its first token/byte."""
+    if span is None:
+        return None
+    offset_ms = span["attrs"].get(key)
+    return span["start"] + offset_ms / 1000 if offset_ms is not None else span["end"]
+
+
+def _path(milestones: list[tuple[str, float | None]]) -> dict[str, float] | None:
+    """Split the time between consecutive milestones into named segments."""
+    if any(t is None for _, t in milestones):
+        return None
+    segments = {}
+    for (_, prev), (name, t) in zip(milestones, milestones[1:]):
+        segments[name] = max(0.0, (t - prev) * 1000)  # pyright: ignore[reportOperatorIssue]
+    return segments
+
+
+def build_turns(spans: list[dict]) -> list[dict]:
+    children: dict[str, list[dict]] = defaultdict(list)
+    for span in spans:
+        children[span["parent_id"]].append(span)
+
+    turns = []
+    for span in spans:
+        if span["name"] != "turn":
+            continue
+        stages = sorted(children[span["span_id"]], key=lambda s: s["start"])
+        first = {}
+        for stage in stages:
+            # cancelled streams (e.g. dropped preemptive generations) never played
+            if not stage["attrs"].get("cancelled"):
+                first.setdefault(stage["name"], stage)
+        eou = first.get("eou")
+        playouts = [s for s in stages if s["name"] == "playout"]
+
+        def _playout_after(t: float | None) -> float | None:
+            if t is None:
+                return None
+            return next((p["start"] for p in playouts if p["start"] >= t), None)
+
+        speech_end = eou["start"] if eou else None
+        eou_end = eou["end"] if eou else None
+        filler_llm = _first_output(first.get("filler.llm"), "ttft_ms")
+        filler_tts = _first_output(first.get("filler.tts"), "ttfb_ms")
+        primary_llm = _first_output(first.get("primary.llm"), "ttft_ms")
+        primary_tts = _first_output(first.get("primary.tts"), "ttfb_ms")
+
+        turns.append(
+            {
+                "trace_id": span["trace_id"],
+                "index": span["attrs"].get("turn.index"),
+                "room": span["resource"].get("room"),
+                "stages": stages,
+                "first_audio": _path(
+                    [
+                        ("speech_end", speech_end),
+                        ("eou", eou_end),
+                        ("filler.llm", filler_llm),
+                        ("filler.tts", filler_tts),
+                        ("playout", _playout_after(filler_tts)),
+                    ]
+                ),
+                "answer": _path(
+                    [
+                        ("speech_end", speech_end),
+                        ("eou", eou_end),
+                        ("primary.llm", primary_llm),
+                        ("primary.tts", primary_tts),
+                        ("playout", _playout_after(primary_tts)),
+                    ]
+                ),
+            }
+        )
+    return turns
+
+
+def print_stage_table(spans: list[dict]) -> None:
+    rows: dict[str, list[float]] = defaultdict(list)
+    for span in spans:
+        if span["name"] in ("session", "turn"):
+            continue
+        rows[f"{span['name']} duration"].append(span["duration_ms"])
+        for key in ("ttft_ms", "ttfb_ms"):
+            if span["attrs"].get(key) is not None:
+                rows[f"{span['name']} {key[:-3]}"].append(span["attrs"][key])
+
+    header = "".join(f"{'p' + str(p):>9}" for p in PERCENTILES)
+    print(f"{'stage (ms)':<26}{'count':>7}{header}{'max':>9}")
+    for name in sorted(rows):
+        values = rows[name]
+        cells = "".join(f"{percentile(values, p):>9.0f}" for p in PERCENTILES)
+        print(f"{name:<26}{len(values):>7}{cells}{max(values):>9.0f}")
+
+
+def print_critical_paths(turns: list[dict]) -> None:
+    for path in ("first_audio", "answer"):
+        breakdowns = [t[path] for t in turns if t[path] is not None]
+        if not breakdowns:
+            continue
+        totals = [sum(b.values()) for b in breakdowns]
+        total_p50 = percentile(totals, 50)
+        print(
+            f"\nCritical path to {path.replace('_', ' ')} "
+            f"({len(breakdowns)} turns, p50 total {total_p50:.0f} ms)"
+        )
+        print(f"{'segment':<14}{'p50':>9}{'p95':>9}{'mean share':>12}")
+        mean_total = sum(totals) / len(totals) or 1.0
+        for segment in breakdowns[0]:
+            values = [b[segment] for b in breakdowns]
+            share = sum(values) / len(values) / mean_total * 100
+            print(
+                f"{segment:<14}{percentile(values, 50):>9.0f}"
+                f"{percentile(values, 95):>9.0f}{share:>11.1f}%"
+            )
+
+
+def print_slowest(turns: list[dict], count: int) -> None:
+    ranked = sorted(
+        (t for t in turns if t["answer"] is not None),
+        key=lambda t: sum(t["answer"].values()),
+        reverse=True,
+    )[:count]
+    if not ranked:
+        return
+    print(f"\nSlowest {len(ranked)} turns by end of speech to answer audio")
+    for turn in ranked:
+        breakdown = ", ".join(f"{k}={v:.0f}" for k, v in turn["answer"].items())
+        print(
+            f"{sum(turn['answer'].values()):>7.0f} ms  trace={turn['trace_id']} "
+            f"turn={turn['index']} room={turn['room']}  [{breakdown}]"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("paths", nargs="*", default=[DEFAULT_DIRECTORY])
+    parser.add_argument("--slowest", type=int, default=10)
+    args = parser.parse_args()
+
+    spans = read_spans(args.paths)
+    if not spans:
+        print("No spans found")
+        return
+    turns = build_turns(spans)
+    print(f"{len(spans)} spans, {len(turns)} turns\n")
+    print_stage_table(spans)
+    print_critical_paths(turns)
+    print_slowest(turns, args.slowest)
+
+
+if __name__ == "__main__":
+    main()